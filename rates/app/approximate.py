@@ -0,0 +1,124 @@
+import datetime
+import math
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rates.app.coverage import CoverageIndex
+from rates.app.models import (
+    ApproximateAveragePrice,
+    ApproximateAveragePrices,
+    RatesRequest,
+)
+from rates.app.prices import clip_request, get_day_average_price, get_days
+from rates.database.backends.base import DayEstimate, PricesBackend
+
+# standard normal quantile for 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+# prices amount, sample size, estimated sum of prices and its variance
+Estimate = Tuple[int, int, float, float]
+
+
+async def get_approximate_average_prices(
+    backend: PricesBackend,
+    request: RatesRequest,
+    coverage_index: Optional[CoverageIndex] = None,
+) -> ApproximateAveragePrices:
+    """
+    Estimates average prices for given origin, destination and date range
+    from stratified sample of prices, queried date range is clipped with
+    `clip_request`
+
+    :param backend: prices storage backend
+    :type backend: PricesBackend
+    :param request: request with origin, destination and date range
+    :type request: RatesRequest
+    :param coverage_index: index with date ranges covered by prices for routes
+    :type coverage_index: Optional[CoverageIndex]
+    :return: list of estimated average prices with confidence intervals
+    for each day in date range
+    :rtype: ApproximateAveragePrices
+    """
+    day_estimates: Iterable[DayEstimate] = []
+    if (query_request := clip_request(request, coverage_index)) is not None:
+        day_estimates = await backend.get_day_estimates(query_request)
+    return estimate_average_prices(day_estimates, request.date_from, request.date_to)
+
+
+def estimate_average_prices(
+    day_estimates: Iterable[DayEstimate],
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> ApproximateAveragePrices:
+    """
+    Merges estimated sums of prices per day into estimated average prices per day
+
+    Estimates of the same day come from independent strata (e.g. from different
+    shards), so their prices amounts, sums and variances are added up
+
+    :param day_estimates: rows with day, prices amount, sample size, estimated
+    sum of prices and its variance, days can repeat
+    :type day_estimates: Iterable[DayEstimate]
+    :param date_from: period start
+    :type date_from: datetime.date
+    :param date_to: period end
+    :type date_to: datetime.date
+    :return: list of estimated average prices for each day in period
+    :rtype: ApproximateAveragePrices
+    """
+    estimates: Dict[datetime.date, List[Estimate]] = defaultdict(list)
+    for day, prices_count, sample_size, prices_sum, variance in day_estimates:
+        # Postgres returns sums as numeric
+        estimates[day].append(
+            (int(prices_count), int(sample_size), float(prices_sum), float(variance))
+        )
+
+    return [
+        estimate_day_average_price(day, estimates.get(day, []))
+        for day in get_days(date_from, date_to)
+    ]
+
+
+def estimate_day_average_price(
+    day: datetime.date, estimates: List[Estimate]
+) -> ApproximateAveragePrice:
+    """
+    Estimates average price of a day from estimated sums of its prices
+
+    The same rule as for exact average price is applied: average price is `null`
+    if day has less than three prices
+
+    :param day: day of estimates
+    :type day: datetime.date
+    :param estimates: list of rows with prices amount, sample size, estimated
+    sum of prices and its variance
+    :type estimates: List[Estimate]
+    :return: estimated average price with 95% confidence interval
+    :rtype: ApproximateAveragePrice
+    """
+    prices_count = sum(estimate[0] for estimate in estimates)
+    sample_size = sum(estimate[1] for estimate in estimates)
+    prices_sum = sum(estimate[2] for estimate in estimates)
+    variance = sum(estimate[3] for estimate in estimates)
+
+    average_price = get_day_average_price(
+        (day, Decimal(prices_sum / prices_count if prices_count else 0), prices_count)
+    )
+    if average_price is None:
+        return ApproximateAveragePrice(
+            day=str(day),
+            average_price=None,
+            confidence_low=None,
+            confidence_high=None,
+            sample_size=sample_size,
+        )
+
+    margin = CONFIDENCE_Z * math.sqrt(max(variance, 0.0)) / prices_count
+    return ApproximateAveragePrice(
+        day=str(day),
+        average_price=average_price,
+        confidence_low=round(average_price - margin, 2),
+        confidence_high=round(average_price + margin, 2),
+        sample_size=sample_size,
+    )
@@ -0,0 +1,106 @@
+import datetime
+from collections import OrderedDict
+from typing import Optional, Tuple, TypeAlias
+
+from rates.app.models import AveragePrices, PortOrRegion, RatesRequest
+
+RequestKey: TypeAlias = Tuple[str, str, str, str]
+
+
+def get_request_key(request: RatesRequest) -> RequestKey:
+    """
+    Creates normalized key for request
+
+    :param request: request with origin, destination and date range
+    :type request: RatesRequest
+    :return: tuple with origin, destination and ISO formatted date range
+    :rtype: RequestKey
+    """
+    return (
+        request.origin,
+        request.destination,
+        request.date_from.isoformat(),
+        request.date_to.isoformat(),
+    )
+
+
+def get_key_request(key: RequestKey) -> RatesRequest:
+    """
+    Creates request from its key
+
+    :param key: tuple with origin, destination and ISO formatted date range
+    :type key: RequestKey
+    :return: request with origin, destination and date range
+    :rtype: RatesRequest
+    :raises ValueError: if key isn't a valid request key
+    :raises TypeError: if key values aren't strings
+    """
+    origin, destination, date_from, date_to = key
+    return RatesRequest(
+        origin=PortOrRegion(origin),
+        destination=PortOrRegion(destination),
+        date_from=datetime.date.fromisoformat(date_from),
+        date_to=datetime.date.fromisoformat(date_to),
+    )
+
+
+class PricesCache:
+    """
+    LRU cache of average prices for requests
+
+    Cache is valid for one version of prices data and has to be invalidated
+    when prices are changed. Results computed before invalidation are ignored,
+    so compute with `generation` taken before querying the database
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.generation = 0
+        self._prices: OrderedDict[RequestKey, AveragePrices] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def get(self, request: RatesRequest) -> Optional[AveragePrices]:
+        """
+        Returns cached average prices for request
+
+        :param request: request with origin, destination and date range
+        :type request: RatesRequest
+        :return: cached average prices or `None` if request isn't cached
+        :rtype: Optional[AveragePrices]
+        """
+        key = get_request_key(request)
+        if (average_prices := self._prices.get(key)) is not None:
+            self._prices.move_to_end(key)
+        return average_prices
+
+    def set(
+        self, request: RatesRequest, average_prices: AveragePrices, generation: int
+    ) -> None:
+        """
+        Caches average prices for request, least recently used request is evicted
+        when cache is full
+
+        :param request: request with origin, destination and date range
+        :type request: RatesRequest
+        :param average_prices: average prices for request
+        :type average_prices: AveragePrices
+        :param generation: cache generation at the moment prices were requested,
+        prices are ignored if cache was invalidated since then
+        :type generation: int
+        """
+        if generation != self.generation:
+            return
+        key = get_request_key(request)
+        self._prices[key] = average_prices
+        self._prices.move_to_end(key)
+        while len(self._prices) > self.max_size:
+            self._prices.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """
+        Removes all cached prices and starts new generation
+        """
+        self.generation += 1
+        self._prices.clear()
@@ -0,0 +1,87 @@
+import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from rates.app.models import RatesRequest
+from rates.database.backends.base import PricesBackend
+
+
+class RouteCoverage(NamedTuple):
+    first_day: datetime.date
+    last_day: datetime.date
+    prices_count: int
+
+
+class CoverageIndex:
+    """
+    In-memory index of (origin key, destination key) -> first day, last day and
+    total amount of prices
+
+    Allows to answer requests for routes without prices without querying
+    the database and to shrink queried date range to the one that has data.
+    Index should be reloaded after prices are changed
+    """
+
+    def __init__(self) -> None:
+        self._routes: Dict[Tuple[str, str], RouteCoverage] = {}
+        self.loaded = False
+
+    async def load(self, backend: PricesBackend) -> None:
+        """
+        (Re)builds index from `prices` and `codes` tables
+
+        :param backend: prices storage backend
+        :type backend: PricesBackend
+        """
+        routes: Dict[Tuple[str, str], RouteCoverage] = {}
+        # routes can repeat in backend coverage (e.g. rows from different shards)
+        for (
+            origin,
+            destination,
+            first_day,
+            last_day,
+            prices_count,
+        ) in await backend.get_routes_coverage():
+            if (coverage := routes.get((origin, destination))) is not None:
+                first_day = min(first_day, coverage.first_day)
+                last_day = max(last_day, coverage.last_day)
+                prices_count += coverage.prices_count
+            routes[(origin, destination)] = RouteCoverage(
+                first_day, last_day, prices_count
+            )
+        self._routes = routes
+        self.loaded = True
+
+    def get(self, origin: str, destination: str) -> Optional[RouteCoverage]:
+        """
+        Returns coverage for given origin and destination keys
+
+        :param origin: region slug or port code of origin
+        :type origin: str
+        :param destination: region slug or port code of destination
+        :type destination: str
+        :return: route coverage or `None` if route has no prices
+        :rtype: Optional[RouteCoverage]
+        """
+        return self._routes.get((origin, destination))
+
+    def clip_request(self, request: RatesRequest) -> Optional[RatesRequest]:
+        """
+        Shrinks request date range to the part of it that has prices
+
+        :param request: request with origin, destination and date range
+        :type request: RatesRequest
+        :return: request with clipped date range or `None` if route has no prices
+        in requested date range
+        :rtype: Optional[RatesRequest]
+        """
+        coverage = self.get(request.origin, request.destination)
+        if coverage is None:
+            return None
+
+        date_from = max(request.date_from, coverage.first_day)
+        date_to = min(request.date_to, coverage.last_day)
+        if date_from > date_to:
+            return None
+        if date_from == request.date_from and date_to == request.date_to:
+            return request
+        return request.copy(update={"date_from": date_from, "date_to": date_to})
@@ -0,0 +1,160 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Generic, Hashable, List, Tuple, TypeVar
+
+from rates.app.cache import (
+    PricesCache,
+    RequestKey,
+    get_key_request,
+    get_request_key,
+)
+from rates.app.coverage import CoverageIndex
+from rates.app.models import RatesRequest
+from rates.app.prices import get_average_prices
+from rates.database.backends.base import PricesBackend
+from rates.utils.files import replaced_file
+
+logger = logging.getLogger(__name__)
+
+Key = TypeVar("Key", bound=Hashable)
+
+
+class SpaceSaving(Generic[Key]):
+    """
+    Space-Saving heavy hitters sketch
+
+    Tracks at most `capacity` keys, when new key comes to a full sketch it replaces
+    the key with the smallest count and inherits its count. Counts are
+    overestimated by at most `error` of the key, every key with frequency
+    bigger than `total / capacity` is guaranteed to be tracked
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.counts: Dict[Key, int] = {}
+        self.errors: Dict[Key, int] = {}
+
+    def add(self, key: Key) -> None:
+        """
+        Counts key occurrence
+
+        :param key: key to count
+        :type key: Key
+        """
+        if key in self.counts:
+            self.counts[key] += 1
+            return
+
+        error = 0
+        if len(self.counts) >= self.capacity:
+            min_key = min(self.counts, key=self.counts.__getitem__)
+            error = self.counts.pop(min_key)
+            del self.errors[min_key]
+        self.counts[key] = error + 1
+        self.errors[key] = error
+
+    def top(self, amount: int) -> List[Tuple[Key, int]]:
+        """
+        Returns most frequent keys
+
+        :param amount: amount of keys to return
+        :type amount: int
+        :return: list of keys with their counts, most frequent first
+        :rtype: List[Tuple[Key, int]]
+        """
+        counts = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return counts[:amount]
+
+
+class HotRoutes:
+    """
+    Tracks most frequent requests and stores them in a file, so they can be
+    used to prewarm prices cache after restart
+    """
+
+    def __init__(self, capacity: int, path: Path) -> None:
+        self.path = path
+        self.sketch: SpaceSaving[RequestKey] = SpaceSaving(capacity)
+
+    def track(self, request: RatesRequest) -> None:
+        """
+        Counts request
+
+        :param request: request with origin, destination and date range
+        :type request: RatesRequest
+        """
+        self.sketch.add(get_request_key(request))
+
+    def get_top(self, amount: int) -> List[RatesRequest]:
+        """
+        Returns most frequent requests
+
+        :param amount: amount of requests to return
+        :type amount: int
+        :return: list of requests, most frequent first
+        :rtype: List[RatesRequest]
+        """
+        return [get_key_request(key) for key, _ in self.sketch.top(amount)]
+
+    def save(self) -> None:
+        """
+        Stores tracked requests with their counts and errors in the file
+        """
+        tracked = [
+            [list(key), count, self.sketch.errors[key]]
+            for key, count in self.sketch.counts.items()
+        ]
+        # several workers may save the same file
+        with replaced_file(self.path) as path:
+            path.write_text(json.dumps(tracked))
+
+    def load(self) -> None:
+        """
+        Loads tracked requests from the file if it exists, invalid file is ignored
+        as well as invalid requests in it
+        """
+        if not self.path.exists():
+            return
+        try:
+            tracked = json.loads(self.path.read_text())
+            counts = {tuple(key): count for key, count, _ in tracked}
+            errors = {tuple(key): error for key, _, error in tracked}
+        except (TypeError, ValueError):
+            logger.exception("Failed to load hot routes from %s", self.path)
+            return
+
+        for key in list(counts):
+            try:
+                get_key_request(key)
+            except (TypeError, ValueError):
+                logger.warning("Ignoring invalid hot route %s", key)
+                del counts[key]
+
+        # keep the most frequent requests if capacity was decreased
+        capacity = self.sketch.capacity
+        top_keys = sorted(counts, key=counts.__getitem__, reverse=True)[:capacity]
+        self.sketch.counts = {key: counts[key] for key in top_keys}
+        self.sketch.errors = {key: errors[key] for key in top_keys}
+
+
+async def prewarm_prices_cache(
+    requests: List[RatesRequest],
+    backend: PricesBackend,
+    coverage_index: CoverageIndex,
+    cache: PricesCache,
+) -> None:
+    """
+    Computes average prices for requests and stores them in cache
+
+    :param requests: requests to compute average prices for
+    :type requests: List[RatesRequest]
+    :param backend: prices storage backend
+    :type backend: PricesBackend
+    :param coverage_index: index with date ranges covered by prices for routes
+    :type coverage_index: CoverageIndex
+    :param cache: cache of average prices for requests
+    :type cache: PricesCache
+    """
+    for request in requests:
+        await get_average_prices(backend, request, coverage_index, cache)
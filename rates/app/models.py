@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime
 from inspect import signature
 from typing import Any, Callable, Dict, List, Optional, Type, TypeAlias
 
@@ -21,6 +21,9 @@ def make_dependable(cls: Type) -> Callable:
 
     Works for endpoints with query params
 
+    Returned function is async, so validation runs in the event loop instead of
+    a threadpool (and is included in request profiles)
+
     usage:
     def fetch(request: Request = Depends(make_dependable(Request))):
 
@@ -30,7 +33,7 @@ def make_dependable(cls: Type) -> Callable:
     :rtype: Callable
     """
 
-    def init_cls_and_handle_errors(*args, **kwargs):
+    async def init_cls_and_handle_errors(*args, **kwargs):
         try:
             signature(init_cls_and_handle_errors).bind(*args, **kwargs)
             return cls(*args, **kwargs)
@@ -61,6 +64,11 @@ class RatesRequest(BaseModel):
         description="region name or port code for destination",
         example="north_europe_main",
     )
+    approximate: bool = Field(
+        default=False,
+        description="estimate average prices from prices sample, "
+        "answers faster for big regions",
+    )
 
     @root_validator(skip_on_failure=True)
     def check_dates_order(cls, values: Dict[str, Any]) -> Dict[str, Any]:
@@ -95,3 +103,30 @@ class AveragePrice(BaseModel):
 
 
 AveragePrices: TypeAlias = List[AveragePrice]
+
+
+class ApproximateAveragePrice(AveragePrice):
+    confidence_low: Optional[float] = Field(
+        ..., description="lower bound of 95% confidence interval of average price"
+    )
+    confidence_high: Optional[float] = Field(
+        ..., description="upper bound of 95% confidence interval of average price"
+    )
+    sample_size: int = Field(..., description="amount of sampled prices")
+
+
+ApproximateAveragePrices: TypeAlias = List[ApproximateAveragePrice]
+
+
+class ProfileInfo(BaseModel):
+    id: str
+    method: str
+    path: str
+    query: str
+    started_at: datetime
+    duration: float = Field(..., description="request handling time in seconds")
+    sql_duration: float = Field(..., description="SQL execution time in seconds")
+    sql_queries: int = Field(..., description="amount of executed SQL queries")
+
+
+ProfileInfos: TypeAlias = List[ProfileInfo]
@@ -1,81 +1,188 @@
 import datetime
+from collections import defaultdict
 from decimal import Decimal
-from typing import Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
+from rates.app.cache import PricesCache
+from rates.app.coverage import CoverageIndex
 from rates.app.models import AveragePrice, AveragePrices, RatesRequest
-from sqlalchemy import text
+from rates.database.backends.base import DayTotal, PricesBackend
 from sqlalchemy.engine import Row
-from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
 
 async def get_average_prices(
-    engine: AsyncEngine, request: RatesRequest
+    backend: PricesBackend,
+    request: RatesRequest,
+    coverage_index: Optional[CoverageIndex] = None,
+    cache: Optional[PricesCache] = None,
 ) -> AveragePrices:
     """
-    Finds average prices for given origin, destination and date range
+    Finds average prices for given origin, destination and date range,
+    uses cached prices if cache is provided
 
-    :param engine: sqlalchemy engine instance
-    :type engine: AsyncEngine
+    :param backend: prices storage backend
+    :type backend: PricesBackend
     :param request: request with origin, destination and date range
     :type request: RatesRequest
+    :param coverage_index: index with date ranges covered by prices for routes
+    :type coverage_index: Optional[CoverageIndex]
+    :param cache: cache of average prices for requests
+    :type cache: Optional[PricesCache]
     :return: list of average prices for each day in date range
     :rtype: AveragePrices
     """
-    async with engine.connect() as connection:
-        prices = await get_prices_for_request(connection, request)
+    if cache is None:
+        return await find_average_prices(backend, request, coverage_index)
+
+    generation = cache.generation
+    if (average_prices := cache.get(request)) is None:
+        average_prices = await find_average_prices(backend, request, coverage_index)
+        cache.set(request, average_prices, generation)
+    return average_prices
+
+
+async def find_average_prices(
+    backend: PricesBackend,
+    request: RatesRequest,
+    coverage_index: Optional[CoverageIndex] = None,
+) -> AveragePrices:
+    """
+    Finds average prices for given origin, destination and date range,
+    queried date range is clipped with `clip_request`
+
+    :param backend: prices storage backend
+    :type backend: PricesBackend
+    :param request: request with origin, destination and date range
+    :type request: RatesRequest
+    :param coverage_index: index with date ranges covered by prices for routes
+    :type coverage_index: Optional[CoverageIndex]
+    :return: list of average prices for each day in date range
+    :rtype: AveragePrices
+    """
+    if (query_request := clip_request(request, coverage_index)) is None:
+        return process_prices(get_empty_days(request.date_from, request.date_to))
+
+    prices = await get_prices_for_request(backend, query_request)
+
+    if query_request is not request:
+        # add days that were clipped by coverage index
+        prices = [
+            *get_empty_days(
+                request.date_from,
+                query_request.date_from - datetime.timedelta(days=1),
+            ),
+            *prices,
+            *get_empty_days(
+                query_request.date_to + datetime.timedelta(days=1), request.date_to
+            ),
+        ]
 
     return process_prices(prices)
 
 
+def clip_request(
+    request: RatesRequest, coverage_index: Optional[CoverageIndex]
+) -> Optional[RatesRequest]:
+    """
+    Shrinks request date range to the part of it that has prices if loaded
+    coverage index is provided, so routes without prices in date range are
+    answered without querying the database
+
+    :param request: request with origin, destination and date range
+    :type request: RatesRequest
+    :param coverage_index: index with date ranges covered by prices for routes
+    :type coverage_index: Optional[CoverageIndex]
+    :return: request to query prices for or `None` if route has no prices
+    in date range
+    :rtype: Optional[RatesRequest]
+    """
+    if coverage_index is None or not coverage_index.loaded:
+        return request
+    return coverage_index.clip_request(request)
+
+
 async def get_prices_for_request(
-    connection: AsyncConnection, request: RatesRequest
-) -> Sequence[Row]:
+    backend: PricesBackend, request: RatesRequest
+) -> Sequence[Tuple[datetime.date, Decimal, int]]:
     """
     Fetches day, average prices and prices amount for given ports and dates
 
-    :param connection: sqlalchemy connection instance
-    :type connection: AsyncConnection
+    :param backend: prices storage backend
+    :type backend: PricesBackend
     :param request: request with origin, destination and date range
     :type request: RatesRequest
     :return: sequence of rows with day, average prices and prices amount
-    :rtype: Sequence[Row]
-    """
-    prices_per_day_query = await connection.execute(
-        text(
-            """
-            WITH prices_per_day as (
-                SELECT day, avg(price) AS avg_price, count(price) AS prices_count
-                FROM prices
-                JOIN (SELECT code FROM codes WHERE key = :origin) origin_codes
-                    ON orig_code = origin_codes.code
-                JOIN (SELECT code FROM codes WHERE key = :destination) destination_codes
-                    ON prices.dest_code = destination_codes.code
-                WHERE day BETWEEN :date_from AND :date_to
-                GROUP BY day
-            ),
-            missing_dates AS (
-                SELECT day, 0 AS avg_price, 0 AS prices_count
-                FROM (
-                    SELECT generate_series(:date_from ::date, :date_to, '1 day')::date
-                    AS day
-                ) date_range
-                WHERE day NOT IN (SELECT day FROM prices_per_day)
-            )
-            SELECT day, avg_price, prices_count FROM prices_per_day
-            UNION
-            SELECT day, avg_price, prices_count FROM missing_dates
-            ORDER BY day
-            """
-        ),
-        {
-            "origin": request.origin,
-            "destination": request.destination,
-            "date_from": request.date_from,
-            "date_to": request.date_to,
-        },
-    )
-    prices_per_day = prices_per_day_query.all()
-    return prices_per_day
+    for each day in date range
+    :rtype: Sequence[Tuple[datetime.date, Decimal, int]]
+    """
+    day_totals = await backend.get_day_totals(request)
+    return merge_day_totals(day_totals, request.date_from, request.date_to)
+
+
+def merge_day_totals(
+    day_totals: Iterable[DayTotal],
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> List[Tuple[datetime.date, Decimal, int]]:
+    """
+    Merges sums and amounts of prices per day into average prices per day
+
+    :param day_totals: rows with day, sum of prices and prices amount,
+    days can repeat (e.g. rows from different shards)
+    :type day_totals: Iterable[DayTotal]
+    :param date_from: period start
+    :type date_from: datetime.date
+    :param date_to: period end
+    :type date_to: datetime.date
+    :return: list of rows with day, average price and prices amount for each day
+    in period, days without prices have zero average price and prices amount
+    :rtype: List[Tuple[datetime.date, Decimal, int]]
+    """
+    prices_sums: Dict[datetime.date, int] = defaultdict(int)
+    prices_counts: Dict[datetime.date, int] = defaultdict(int)
+    for day, prices_sum, prices_count in day_totals:
+        prices_sums[day] += prices_sum
+        prices_counts[day] += prices_count
+
+    return [
+        (day, Decimal(prices_sums[day]) / prices_counts[day], prices_counts[day])
+        if day in prices_counts
+        else (day, Decimal(0), 0)
+        for day in get_days(date_from, date_to)
+    ]
+
+
+def get_days(date_from: datetime.date, date_to: datetime.date) -> List[datetime.date]:
+    """
+    Creates list of days in given time period
+
+    :param date_from: period start
+    :type date_from: datetime.date
+    :param date_to: period end, period is empty if it's before `date_from`
+    :type date_to: datetime.date
+    :return: list of days
+    :rtype: List[datetime.date]
+    """
+    return [
+        date_from + datetime.timedelta(days=offset)
+        for offset in range((date_to - date_from).days + 1)
+    ]
+
+
+def get_empty_days(
+    date_from: datetime.date, date_to: datetime.date
+) -> List[Tuple[datetime.date, Decimal, int]]:
+    """
+    Creates rows without prices for each day in given time period
+
+    :param date_from: period start
+    :type date_from: datetime.date
+    :param date_to: period end, period is empty if it's before `date_from`
+    :type date_to: datetime.date
+    :return: list of rows with day, zero average price and zero prices amount
+    :rtype: List[Tuple[datetime.date, Decimal, int]]
+    """
+    return [(day, Decimal(0), 0) for day in get_days(date_from, date_to)]
 
 
 def get_day_average_price(
@@ -0,0 +1,253 @@
+import logging
+import pstats
+import random
+import re
+import secrets
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from fastapi import HTTPException, Request, status
+from rates.app.models import ProfileInfo, ProfileInfos
+from rates.utils.environment import Environment
+from rates.utils.files import replaced_file
+from rates.utils.profiling import RequestProfile, request_profile
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_ID_PATTERN = re.compile(r"^\d+-[0-9a-f]{8}$")
+
+logger = logging.getLogger(__name__)
+
+
+class SqlTiming:
+    """
+    Accumulates execution time of SQL queries made while handling a request
+    """
+
+    def __init__(self) -> None:
+        self.duration = 0.0
+        self.queries = 0
+
+
+sql_timing: ContextVar[Optional[SqlTiming]] = ContextVar("sql_timing", default=None)
+
+
+def track_sql_timing(engine: AsyncEngine) -> None:
+    """
+    Registers engine event listeners that add SQL queries execution time
+    to `sql_timing` of the current context
+
+    :param engine: sqlalchemy engine instance
+    :type engine: AsyncEngine
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_query_timer(conn: Any, *args: Any) -> None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def stop_query_timer(conn: Any, *args: Any) -> None:
+        start_time = conn.info["query_start_time"].pop()
+        if (timing := sql_timing.get()) is not None:
+            timing.duration += time.perf_counter() - start_time
+            timing.queries += 1
+
+
+class ProfileStore:
+    """
+    Bounded on-disk ring buffer of request profiles
+
+    Each profile is stored as `<id>.prof` file with `pstats` data and `<id>.json`
+    file with request info, oldest profiles are removed when capacity is exceeded.
+    Files are written atomically and info is written last, so listed profiles
+    are complete
+    """
+
+    def __init__(self, directory: Path, capacity: int) -> None:
+        self.directory = directory
+        self.capacity = capacity
+
+    def save(self, stats: pstats.Stats, info: ProfileInfo) -> None:
+        """
+        Stores profile and removes oldest profiles over capacity
+
+        :param stats: finished request profile stats
+        :type stats: pstats.Stats
+        :param info: profiled request info
+        :type info: ProfileInfo
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with replaced_file(self.directory.joinpath(f"{info.id}.prof")) as path:
+            stats.dump_stats(path)
+        with replaced_file(self.directory.joinpath(f"{info.id}.json")) as path:
+            path.write_text(info.json())
+
+        for outdated_info in self.list()[self.capacity :]:
+            for suffix in (".prof", ".json"):
+                self.directory.joinpath(f"{outdated_info.id}{suffix}").unlink(
+                    missing_ok=True
+                )
+
+    def list(self) -> ProfileInfos:
+        """
+        Lists stored profiles, newest first, invalid info files are skipped
+
+        :return: list of stored profiles info
+        :rtype: ProfileInfos
+        """
+        if not self.directory.exists():
+            return []
+        infos = []
+        for path in self.directory.glob("*.json"):
+            try:
+                infos.append(ProfileInfo.parse_file(path))
+            except (OSError, ValueError):
+                # file may be removed by concurrent save or be left by old version
+                logger.warning("Skipping invalid profile info %s", path)
+        return sorted(infos, key=lambda info: info.id, reverse=True)
+
+    def get_path(self, profile_id: str) -> Optional[Path]:
+        """
+        Returns path to stored profile `pstats` data
+
+        :param profile_id: profile id
+        :type profile_id: str
+        :return: path to profile data or `None` if profile doesn't exist
+        :rtype: Optional[Path]
+        """
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self.directory.joinpath(f"{profile_id}.prof")
+        return path if path.exists() else None
+
+
+def is_admin_request(request: Request, environment: Environment) -> bool:
+    """
+    Checks if request has profiling admin token
+
+    :param request: incoming request
+    :type request: Request
+    :param environment: environment with profiling settings
+    :type environment: Environment
+    :return: `True` if non-empty admin token is configured and request has it
+    :rtype: bool
+    """
+    admin_token = environment.profiling_admin_token
+    token = request.headers.get(PROFILE_TOKEN_HEADER)
+    if not admin_token or not token:
+        return False
+    return secrets.compare_digest(token, admin_token)
+
+
+def check_admin_request(request: Request, environment: Environment) -> None:
+    """
+    Checks that request has profiling admin token
+
+    :param request: incoming request
+    :type request: Request
+    :param environment: environment with profiling settings
+    :type environment: Environment
+    :raises HTTPException: if request doesn't have admin token
+    """
+    if not is_admin_request(request, environment):
+        raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Not allowed")
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests with admin token and sampled fraction of all requests
+
+    Profile covers request handling from query params validation to response
+    serialization and stops when response starts, so streamed response bodies
+    aren't profiled. `cProfile` profiles the whole thread, so time of requests
+    handled concurrently may be included, only one request is profiled at a time
+
+    Written as plain ASGI middleware, so requests that aren't profiled are passed
+    to the app as is
+    """
+
+    def __init__(
+        self, app: ASGIApp, store: ProfileStore, environment: Environment
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.environment = environment
+        self.profiling_in_progress = False
+
+    def should_profile(self, request: Request) -> bool:
+        """
+        Checks if request should be profiled
+
+        :param request: incoming request
+        :type request: Request
+        :return: `True` if no other request is being profiled and request has
+        admin token or is sampled
+        :rtype: bool
+        """
+        if self.profiling_in_progress:
+            return False
+        if is_admin_request(request, self.environment):
+            return True
+        return random.random() < self.environment.profiling_sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        if not self.should_profile(request):
+            await self.app(scope, receive, send)
+            return
+
+        self.profiling_in_progress = True
+        profile = RequestProfile()
+        timing = SqlTiming()
+        timing_token = sql_timing.set(timing)
+        profile_token = request_profile.set(profile)
+        started_at = datetime.now(timezone.utc)
+        start_time = time.perf_counter()
+        stopped = False
+
+        def stop_profiling() -> ProfileInfo:
+            nonlocal stopped
+            stopped = True
+            profile.profile.disable()
+            self.profiling_in_progress = False
+            return ProfileInfo(
+                id=f"{time.time_ns()}-{secrets.token_hex(4)}",
+                method=request.method,
+                path=request.url.path,
+                query=request.url.query,
+                started_at=started_at,
+                duration=time.perf_counter() - start_time,
+                sql_duration=timing.duration,
+                sql_queries=timing.queries,
+            )
+
+        async def send_profiled(message: Message) -> None:
+            if message["type"] != "http.response.start" or stopped:
+                await send(message)
+                return
+            info = stop_profiling()
+            await send(message)
+            try:
+                await run_in_threadpool(self.store.save, profile.get_stats(), info)
+            except OSError:
+                # response has started, so failed save can't fail the request
+                logger.exception("Failed to save profile %s", info.id)
+
+        try:
+            profile.profile.enable()
+            await self.app(scope, receive, send_profiled)
+        finally:
+            if not stopped:
+                # profile of request that failed before response start is dropped
+                stop_profiling()
+            request_profile.reset(profile_token)
+            sql_timing.reset(timing_token)
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from rates.app.cache import PricesCache
+from rates.app.coverage import CoverageIndex
+from rates.app.models import AveragePrice, AveragePrices, RatesRequest
+from rates.app.prices import get_average_prices, get_days
+from rates.database.backends.base import PricesBackend
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    Client subscription to average prices of a route in a date range
+
+    Keeps the last sent average prices and collects changed days until client
+    takes them, so slow clients get merged changes instead of a growing backlog.
+    Average prices are versioned by prices data changes, so prices computed
+    for an older version never replace newer ones
+    """
+
+    def __init__(self, request: RatesRequest) -> None:
+        self.request = request
+        self.days = {str(day) for day in get_days(request.date_from, request.date_to)}
+        self.prices: Dict[str, AveragePrice] = {}
+        # version of prices data `prices` were computed for, `None` until
+        # the first average prices are stored
+        self.version: Optional[int] = None
+        self._changes: Dict[str, AveragePrice] = {}
+        self._changed = asyncio.Event()
+
+    def update(self, average_prices: AveragePrices, version: int) -> None:
+        """
+        Stores average prices computed for prices data version, the first
+        stored prices are sent to client as is and changed days of the following
+        ones are collected for client
+
+        :param average_prices: new average prices, days outside of subscription
+        date range are ignored
+        :type average_prices: AveragePrices
+        :param version: version of prices data average prices were computed for,
+        prices of versions that aren't newer than stored ones are ignored
+        :type version: int
+        """
+        if self.version is not None and version <= self.version:
+            return
+
+        prices = [price for price in average_prices if price.day in self.days]
+        if self.version is None:
+            self.prices = {price.day: price for price in prices}
+        else:
+            for price in prices:
+                if self.prices.get(price.day) != price:
+                    self.prices[price.day] = price
+                    self._changes[price.day] = price
+        self.version = version
+        if self._changes:
+            self._changed.set()
+
+    async def get_changes(self, timeout: float) -> AveragePrices:
+        """
+        Waits for changed days and returns them
+
+        :param timeout: maximal waiting time in seconds
+        :type timeout: float
+        :return: list of changed average prices ordered by day, empty if nothing
+        has changed in `timeout` seconds
+        :rtype: AveragePrices
+        """
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        changes = sorted(self._changes.values(), key=lambda price: price.day)
+        self._changes = {}
+        self._changed.clear()
+        return changes
+
+
+class SubscriptionHub:
+    """
+    Registry of subscriptions that detects changed days once per prices data
+    change and fans them out to subscribers
+
+    Average prices are computed once per route for the date range covering
+    all route subscriptions. Subscriptions are registered before their initial
+    average prices are computed, so they don't miss changes published meanwhile
+    and neither subscribing nor publishing waits for each other
+    """
+
+    def __init__(
+        self,
+        backend: PricesBackend,
+        coverage_index: CoverageIndex,
+        cache: Optional[PricesCache] = None,
+    ) -> None:
+        self.backend = backend
+        self.coverage_index = coverage_index
+        self.cache = cache
+        self._routes: Dict[Tuple[str, str], Set[Subscription]] = defaultdict(set)
+        # incremented on every prices data change
+        self._version = 0
+
+    async def subscribe(self, request: RatesRequest) -> Subscription:
+        """
+        Registers subscription and computes its initial average prices
+
+        :param request: request with origin, destination and date range
+        :type request: RatesRequest
+        :return: subscription with initial average prices
+        :rtype: Subscription
+        """
+        subscription = Subscription(request)
+        self._routes[(request.origin, request.destination)].add(subscription)
+        version = self._version
+        try:
+            average_prices = await get_average_prices(
+                self.backend, request, self.coverage_index, self.cache
+            )
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        # ignored if prices of a newer version were published meanwhile
+        subscription.update(average_prices, version)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Removes subscription
+
+        :param subscription: registered subscription
+        :type subscription: Subscription
+        """
+        route = (subscription.request.origin, subscription.request.destination)
+        self._routes[route].discard(subscription)
+        if not self._routes[route]:
+            del self._routes[route]
+
+    async def publish_changes(self) -> None:
+        """
+        Recomputes average prices of subscribed routes and sends changed days
+        to subscribers, should be called once per prices data change
+
+        Failure of a route is logged and doesn't stop publishing of other routes
+        """
+        self._version += 1
+        version = self._version
+        routes = list(self._routes.items())
+        results = await asyncio.gather(
+            *(
+                self.publish_route_changes(subscriptions, version)
+                for _, subscriptions in routes
+            ),
+            return_exceptions=True,
+        )
+        for (route, _), result in zip(routes, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to publish prices changes of route %s",
+                    route,
+                    exc_info=result,
+                )
+
+    async def publish_route_changes(
+        self, subscriptions: Set[Subscription], version: int
+    ) -> None:
+        """
+        Recomputes average prices of a route for date range covering all
+        subscriptions and sends changed days to subscribers
+
+        :param subscriptions: subscriptions of the same route
+        :type subscriptions: Set[Subscription]
+        :param version: version of prices data
+        :type version: int
+        """
+        # route subscriptions can change while prices are computed
+        subscriptions = set(subscriptions)
+        if not subscriptions:
+            return
+        request = next(iter(subscriptions)).request
+        route_request = RatesRequest(
+            date_from=min(
+                subscription.request.date_from for subscription in subscriptions
+            ),
+            date_to=max(subscription.request.date_to for subscription in subscriptions),
+            origin=request.origin,
+            destination=request.destination,
+        )
+        average_prices = await get_average_prices(
+            self.backend, route_request, self.coverage_index, self.cache
+        )
+        for subscription in subscriptions:
+            subscription.update(average_prices, version)
+
+
+def format_event(average_prices: AveragePrices) -> str:
+    """
+    Formats average prices as server-sent event
+
+    :param average_prices: list of average prices
+    :type average_prices: AveragePrices
+    :return: `prices` event with JSON list of average prices as data
+    :rtype: str
+    """
+    data = json.dumps([price.dict() for price in average_prices])
+    return f"event: prices\ndata: {data}\n\n"
+
+
+async def stream_events(
+    hub: SubscriptionHub,
+    subscription: Subscription,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    heartbeat_interval: float,
+) -> AsyncIterator[str]:
+    """
+    Streams initial average prices and then changed days as server-sent events
+    until client disconnects
+
+    :param hub: hub subscription is registered in
+    :type hub: SubscriptionHub
+    :param subscription: registered subscription
+    :type subscription: Subscription
+    :param is_disconnected: function that checks if client has disconnected
+    :type is_disconnected: Callable[[], Awaitable[bool]]
+    :param heartbeat_interval: interval in seconds to send comments to keep
+    connection alive when nothing has changed
+    :type heartbeat_interval: float
+    :return: async iterator of server-sent events
+    :rtype: AsyncIterator[str]
+    """
+    try:
+        yield format_event(list(subscription.prices.values()))
+        while not await is_disconnected():
+            if changes := await subscription.get_changes(heartbeat_interval):
+                yield format_event(changes)
+            else:
+                yield ": heartbeat\n\n"
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable, List, Optional
+
+from rates.database.backends.base import PricesBackend
+
+logger = logging.getLogger(__name__)
+
+
+class PricesWatcher:
+    """
+    Periodically checks version of `prices` data and calls registered callbacks
+    when it's changed
+    """
+
+    def __init__(self, backend: PricesBackend, interval: float) -> None:
+        self.backend = backend
+        self.interval = interval
+        self.version: Optional[Hashable] = None
+        self._callbacks: List[Callable[[], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_change(
+        self, callback: Callable[[], Awaitable[None]]
+    ) -> Callable[[], Awaitable[None]]:
+        """
+        Registers callback to call when prices data is changed, can be used
+        as a decorator
+
+        :param callback: async function without arguments
+        :type callback: Callable[[], Awaitable[None]]
+        :return: registered callback
+        :rtype: Callable[[], Awaitable[None]]
+        """
+        self._callbacks.append(callback)
+        return callback
+
+    async def check(self) -> bool:
+        """
+        Fetches prices data version and calls callbacks if it has changed
+        since the previous check, first check only stores the version
+
+        :return: `True` if prices data has changed
+        :rtype: bool
+        """
+        version = await self.backend.get_version()
+        changed = self.version is not None and version != self.version
+        self.version = version
+        if changed:
+            for callback in self._callbacks:
+                try:
+                    await callback()
+                except Exception:
+                    logger.exception("Failed to handle prices data change")
+        return changed
+
+    async def watch(self) -> None:
+        """
+        Checks prices data version every `interval` seconds until cancelled
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception:
+                # watcher should survive temporary database problems
+                logger.exception("Failed to check prices data version")
+
+    def start(self) -> None:
+        """
+        Starts watching in background task
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.watch())
+
+    async def stop(self) -> None:
+        """
+        Stops background task
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
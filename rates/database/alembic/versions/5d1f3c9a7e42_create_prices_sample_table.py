@@ -0,0 +1,36 @@
+"""create prices sample table
+
+Revision ID: 5d1f3c9a7e42
+Revises: bc2e6c418b6f
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d1f3c9a7e42"
+down_revision = "bc2e6c418b6f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # table stores stratified sample of prices for approximate average prices,
+    # it's filled with `python -m rates.database.sample`
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS prices_sample ("
+        "   orig_code text NOT NULL, "
+        "   dest_code text NOT NULL, "
+        "   day date NOT NULL, "
+        "   price integer NOT NULL, "
+        "   prices_count integer NOT NULL "
+        ")"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS prices_sample_route_day_idx "
+        "ON prices_sample (orig_code, dest_code, day)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS prices_sample")
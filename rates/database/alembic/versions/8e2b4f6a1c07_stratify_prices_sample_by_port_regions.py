@@ -0,0 +1,40 @@
+"""stratify prices sample by port regions
+
+Revision ID: 8e2b4f6a1c07
+Revises: 5d1f3c9a7e42
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+from rates.database.sample import CREATE_PRICES_SAMPLE_QUERIES
+
+# revision identifiers, used by Alembic.
+revision = "8e2b4f6a1c07"
+down_revision = "5d1f3c9a7e42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # sample is derived from prices, so it's recreated with region columns,
+    # it's filled on the next prices change or with `python -m rates.database.sample`
+    op.execute("DROP TABLE IF EXISTS prices_sample")
+    for query in CREATE_PRICES_SAMPLE_QUERIES:
+        op.execute(query)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS prices_sample")
+    op.execute(
+        "CREATE TABLE prices_sample ("
+        "   orig_code text NOT NULL, "
+        "   dest_code text NOT NULL, "
+        "   day date NOT NULL, "
+        "   price integer NOT NULL, "
+        "   prices_count integer NOT NULL "
+        ")"
+    )
+    op.execute(
+        "CREATE INDEX prices_sample_route_day_idx "
+        "ON prices_sample (orig_code, dest_code, day)"
+    )
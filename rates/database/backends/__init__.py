@@ -0,0 +1,34 @@
+from rates.database.backends.base import PricesBackend
+from rates.database.backends.chunked import ChunkedBackend
+from rates.database.backends.postgres import PostgresBackend
+from rates.database.shards import get_shards
+from rates.utils.environment import Environment
+
+
+def get_backend(environment: Environment) -> PricesBackend:
+    """
+    Creates storage backend selected in environment, wraps it to split long
+    date ranges into chunks if `CHUNK_DAYS` is set
+
+    :param environment: environment with storage settings
+    :type environment: Environment
+    :return: storage backend
+    :rtype: PricesBackend
+    """
+    backend: PricesBackend
+    if environment.storage_backend == "duckdb":
+        # duckdb is only required for `duckdb` storage backend
+        from rates.database.backends.columnar import DuckDBBackend
+
+        backend = DuckDBBackend(environment.duckdb_directory)
+    else:
+        backend = PostgresBackend(get_shards(environment))
+
+    if environment.chunk_days > 0:
+        backend = ChunkedBackend(
+            backend,
+            environment.chunk_days,
+            environment.chunk_parallelism,
+            environment.chunk_concurrency,
+        )
+    return backend
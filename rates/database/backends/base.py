@@ -0,0 +1,74 @@
+import datetime
+from abc import ABC, abstractmethod
+from typing import Hashable, Sequence, Tuple, TypeAlias
+
+from rates.app.models import RatesRequest
+
+# day, sum of prices and prices amount
+DayTotal: TypeAlias = Tuple[datetime.date, int, int]
+# day, prices amount, sample size, estimated sum of prices and its variance
+DayEstimate: TypeAlias = Tuple[datetime.date, int, int, float, float]
+# origin key, destination key, first day, last day and prices amount
+RouteCoverageRow: TypeAlias = Tuple[str, str, datetime.date, datetime.date, int]
+
+
+class PricesBackend(ABC):
+    """
+    Storage of `prices`, `prices_sample` and `codes` tables
+
+    Backends may return partial aggregates (e.g. one per shard), so days and routes
+    can repeat in results and have to be merged by the caller
+    """
+
+    @abstractmethod
+    async def get_day_totals(self, request: RatesRequest) -> Sequence[DayTotal]:
+        """
+        Fetches day, sum of prices and prices amount for given keys and dates,
+        only days that have prices are returned
+
+        :param request: request with origin, destination and date range
+        :type request: RatesRequest
+        :return: sequence of rows with day, sum of prices and prices amount
+        :rtype: Sequence[DayTotal]
+        """
+
+    @abstractmethod
+    async def get_day_estimates(self, request: RatesRequest) -> Sequence[DayEstimate]:
+        """
+        Estimates sum of prices per day for given keys and dates from stratified
+        `prices_sample`, only days that have prices are returned
+
+        :param request: request with origin, destination and date range
+        :type request: RatesRequest
+        :return: sequence of rows with day, prices amount, sample size, estimated
+        sum of prices and its variance
+        :rtype: Sequence[DayEstimate]
+        """
+
+    @abstractmethod
+    async def refresh_prices_sample(self, sample_size: int) -> None:
+        """
+        Rebuilds `prices_sample` from current `prices`
+
+        :param sample_size: maximal amount of prices stored per stratum
+        :type sample_size: int
+        """
+
+    @abstractmethod
+    async def get_routes_coverage(self) -> Sequence[RouteCoverageRow]:
+        """
+        Fetches first day, last day and prices amount for every route
+
+        :return: sequence of rows with origin key, destination key, first day,
+        last day and prices amount
+        :rtype: Sequence[RouteCoverageRow]
+        """
+
+    @abstractmethod
+    async def get_version(self) -> Hashable:
+        """
+        Fetches version of prices data, version changes when prices are changed
+
+        :return: prices data version
+        :rtype: Hashable
+        """
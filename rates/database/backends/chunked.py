@@ -0,0 +1,96 @@
+import asyncio
+import datetime
+from itertools import chain
+from typing import Hashable, List, Sequence
+
+from rates.app.models import RatesRequest
+from rates.database.backends.base import (
+    DayEstimate,
+    DayTotal,
+    PricesBackend,
+    RouteCoverageRow,
+)
+
+
+class ChunkedBackend(PricesBackend):
+    """
+    Backend wrapper that splits long date ranges into chunks of `chunk_days` days
+    and queries them concurrently, at most `parallelism` chunks of a request
+    and `concurrency` chunks of all requests at a time
+
+    Every chunk is executed on its own pooled connection (for Postgres) or thread
+    (for DuckDB), so one long request can use several database workers. Limit
+    shared by all requests keeps concurrent long requests from taking all
+    connections of the pool
+    """
+
+    def __init__(
+        self,
+        backend: PricesBackend,
+        chunk_days: int,
+        parallelism: int,
+        concurrency: int,
+    ) -> None:
+        self.backend = backend
+        self.chunk_days = chunk_days
+        self.parallelism = parallelism
+        self.concurrency = concurrency
+        self._chunks_semaphore = asyncio.Semaphore(concurrency)
+
+    async def get_day_totals(self, request: RatesRequest) -> List[DayTotal]:
+        chunks = split_request(request, self.chunk_days)
+        if len(chunks) == 1:
+            return list(await self.backend.get_day_totals(request))
+
+        # semaphore is created per request, so parallelism is limited per request
+        semaphore = asyncio.Semaphore(self.parallelism)
+
+        async def get_chunk_day_totals(chunk: RatesRequest) -> Sequence[DayTotal]:
+            async with semaphore, self._chunks_semaphore:
+                return await self.backend.get_day_totals(chunk)
+
+        chunks_day_totals = await asyncio.gather(
+            *(get_chunk_day_totals(chunk) for chunk in chunks)
+        )
+        # chunks are returned in order of their date ranges
+        return list(chain.from_iterable(chunks_day_totals))
+
+    async def get_day_estimates(self, request: RatesRequest) -> Sequence[DayEstimate]:
+        # sample is small, so it's queried at once
+        return await self.backend.get_day_estimates(request)
+
+    async def refresh_prices_sample(self, sample_size: int) -> None:
+        await self.backend.refresh_prices_sample(sample_size)
+
+    async def get_routes_coverage(self) -> Sequence[RouteCoverageRow]:
+        return await self.backend.get_routes_coverage()
+
+    async def get_version(self) -> Hashable:
+        return await self.backend.get_version()
+
+
+def split_request(request: RatesRequest, chunk_days: int) -> List[RatesRequest]:
+    """
+    Splits request date range into consecutive chunks
+
+    :param request: request with origin, destination and date range
+    :type request: RatesRequest
+    :param chunk_days: maximal amount of days in a chunk
+    :type chunk_days: int
+    :return: list of requests with chunk date ranges, the last chunk can be shorter
+    :rtype: List[RatesRequest]
+    """
+    if (request.date_to - request.date_from).days < chunk_days:
+        return [request]
+
+    chunks = []
+    chunk_from = request.date_from
+    while chunk_from <= request.date_to:
+        chunk_to = min(
+            chunk_from + datetime.timedelta(days=chunk_days - 1), request.date_to
+        )
+        chunks.append(
+            request.copy(update={"date_from": chunk_from, "date_to": chunk_to})
+        )
+        chunk_from = chunk_to + datetime.timedelta(days=1)
+    return chunks
@@ -0,0 +1,313 @@
+import asyncio
+import csv
+import threading
+from pathlib import Path
+from typing import Any, Hashable, List, Sequence
+
+import duckdb
+from rates.app.models import RatesRequest
+from rates.database.backends.base import (
+    DayEstimate,
+    DayTotal,
+    PricesBackend,
+    RouteCoverageRow,
+)
+from rates.database.sample import get_prices_sample_query
+from rates.database.shards import Shards, get_shards
+from rates.utils.environment import Environment
+from rates.utils.files import replaced_file
+from rates.utils.profiling import run_profiled
+from sqlalchemy import text
+
+TABLES = ("prices", "codes")
+# sample is built from `prices.parquet`, not exported from the database
+SAMPLE_TABLE = "prices_sample"
+TABLE_COLUMNS = {
+    "prices": "{'orig_code': 'VARCHAR', 'dest_code': 'VARCHAR', "
+    "'day': 'DATE', 'price': 'INTEGER'}",
+    "codes": "{'key': 'VARCHAR', 'code': 'VARCHAR'}",
+}
+# `prices` are sorted by route and day, so DuckDB can skip row groups that
+# don't match a query
+TABLE_ORDER = {
+    "prices": "orig_code, dest_code, day",
+    "codes": "key",
+    SAMPLE_TABLE: "orig_region, dest_region, day",
+}
+
+
+class DuckDBBackend(PricesBackend):
+    """
+    Embedded columnar storage, `prices` and `codes` tables are read from
+    `prices.parquet` and `codes.parquet` files of the directory by DuckDB,
+    `prices_sample` is read from `prices_sample.parquet`
+
+    Queries are executed in threads, each thread uses its own cursor,
+    queries of profiled requests are profiled in their threads
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.connection = duckdb.connect()
+        for table in (*TABLES, SAMPLE_TABLE):
+            path = quote_path(self.directory.joinpath(f"{table}.parquet"))
+            self.connection.execute(
+                f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{path}')"
+            )
+        self._local = threading.local()
+
+    def _execute(self, query: str, parameters: Sequence[Any] = ()) -> List[Any]:
+        if (cursor := getattr(self._local, "cursor", None)) is None:
+            cursor = self._local.cursor = self.connection.cursor()
+        return cursor.execute(query, parameters).fetchall()
+
+    async def get_day_totals(self, request: RatesRequest) -> List[DayTotal]:
+        return await asyncio.to_thread(
+            run_profiled,
+            self._execute,
+            """
+            SELECT day, sum(price) AS prices_sum, count(price) AS prices_count
+            FROM prices
+            JOIN (SELECT code FROM codes WHERE key = ?) origin_codes
+                ON orig_code = origin_codes.code
+            JOIN (SELECT code FROM codes WHERE key = ?) destination_codes
+                ON prices.dest_code = destination_codes.code
+            WHERE day BETWEEN ? AND ?
+            GROUP BY day
+            """,
+            [request.origin, request.destination, request.date_from, request.date_to],
+        )
+
+    async def get_day_estimates(self, request: RatesRequest) -> List[DayEstimate]:
+        return await asyncio.to_thread(run_profiled, self._get_day_estimates, request)
+
+    def _get_day_estimates(self, request: RatesRequest) -> List[DayEstimate]:
+        # the same estimates as in Postgres backend (see `get_shard_day_estimates`),
+        # DuckDB doesn't skip the unused part of a query with both sample and exact
+        # prices, so the part is chosen before querying
+        parameters = [
+            request.origin,
+            request.destination,
+            request.date_from,
+            request.date_to,
+        ]
+        ((ports_count,),) = self._execute(
+            """
+            SELECT count(*) FROM codes
+            WHERE (key = $1 AND code = $1) OR (key = $2 AND code = $2)
+            """,
+            parameters[:2],
+        )
+        if ports_count:
+            return self._execute(
+                """
+                SELECT day, count(price), count(price), sum(price), 0
+                FROM prices
+                JOIN (SELECT code FROM codes WHERE key = $1) origin_codes
+                    ON orig_code = origin_codes.code
+                JOIN (SELECT code FROM codes WHERE key = $2) destination_codes
+                    ON prices.dest_code = destination_codes.code
+                WHERE day BETWEEN $3 AND $4
+                GROUP BY day
+                """,
+                parameters,
+            )
+        return self._execute(
+            """
+            SELECT day, sum(prices_count) AS prices_count,
+                sum(sample_size) AS sample_size,
+                sum(prices_count * mean_price) AS prices_sum,
+                sum(
+                    prices_count * (prices_count - sample_size)
+                    * sample_variance / sample_size
+                ) AS prices_sum_variance
+            FROM (
+                SELECT day, prices_count, count(price) AS sample_size,
+                    avg(price) AS mean_price,
+                    coalesce(var_samp(price), 0) AS sample_variance
+                FROM prices_sample
+                JOIN (SELECT code FROM codes WHERE key = $1) origin_codes
+                    ON orig_code = origin_codes.code
+                JOIN (SELECT code FROM codes WHERE key = $2) destination_codes
+                    ON prices_sample.dest_code = destination_codes.code
+                WHERE day BETWEEN $3 AND $4
+                GROUP BY orig_region, dest_region, day, prices_count
+            ) strata
+            GROUP BY day
+            """,
+            parameters,
+        )
+
+    async def refresh_prices_sample(self, sample_size: int) -> None:
+        await asyncio.to_thread(refresh_sample_parquet, self.directory, sample_size)
+
+    async def get_routes_coverage(self) -> List[RouteCoverageRow]:
+        return await asyncio.to_thread(
+            run_profiled,
+            self._execute,
+            """
+            SELECT origin_codes.key, destination_codes.key,
+                min(day), max(day), count(price)
+            FROM prices
+            JOIN codes origin_codes ON orig_code = origin_codes.code
+            JOIN codes destination_codes ON dest_code = destination_codes.code
+            GROUP BY origin_codes.key, destination_codes.key
+            """,
+        )
+
+    async def get_version(self) -> Hashable:
+        versions = []
+        for table in TABLES:
+            stat = self.directory.joinpath(f"{table}.parquet").stat()
+            versions.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(versions)
+
+
+async def export_to_parquet(
+    shards: Shards, directory: Path, sample_size: int, batch_size: int = 100_000
+) -> None:
+    """
+    Exports `prices` from all shards and `codes` from default shard
+    to Parquet files for `DuckDBBackend` and builds prices sample from them
+
+    Rows are written to temporary CSV files first
+
+    :param shards: shards with sqlalchemy engine instances
+    :type shards: Shards
+    :param directory: directory to store `prices.parquet`, `codes.parquet`
+    and `prices_sample.parquet` in
+    :type directory: Path
+    :param sample_size: maximal amount of sampled prices per stratum
+    :type sample_size: int
+    :param batch_size: amount of rows fetched from database at once
+    :type batch_size: int
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    sources = [
+        (engine, "prices", "SELECT orig_code, dest_code, day, price FROM prices")
+        for engine in shards.engines.values()
+    ]
+    sources.append((shards.default_engine, "codes", "SELECT key, code FROM codes"))
+
+    csv_paths = {table: directory.joinpath(f"{table}.csv") for table in TABLES}
+    csv_files = {table: path.open("w", newline="") for table, path in csv_paths.items()}
+    try:
+        for engine, table, query in sources:
+            writer = csv.writer(csv_files[table])
+            async with engine.connect() as database_connection:
+                result = await database_connection.stream(text(query))
+                async for rows in result.partitions(batch_size):
+                    writer.writerows(rows)
+    finally:
+        for csv_file in csv_files.values():
+            csv_file.close()
+
+    try:
+        for table in TABLES:
+            write_parquet(table, csv_paths[table], directory)
+    finally:
+        for csv_path in csv_paths.values():
+            csv_path.unlink(missing_ok=True)
+    write_sample_parquet(directory, sample_size)
+
+
+def write_parquet(table: str, csv_path: Path, directory: Path) -> None:
+    """
+    Converts CSV file with table rows to `<table>.parquet` file
+
+    Parquet file is replaced only when it's fully written, so running backend
+    doesn't read partially written file
+
+    :param table: table name, `prices` or `codes`
+    :type table: str
+    :param csv_path: path to CSV file without header
+    :type csv_path: Path
+    :param directory: directory to store Parquet file in
+    :type directory: Path
+    """
+    parquet_path = directory.joinpath(f"{table}.parquet")
+    temporary_path = parquet_path.with_suffix(".tmp")
+    connection = duckdb.connect()
+    try:
+        connection.execute(
+            f"COPY (SELECT * FROM read_csv('{quote_path(csv_path)}', header=false, "
+            f"columns={TABLE_COLUMNS[table]}) ORDER BY {TABLE_ORDER[table]}) "
+            f"TO '{quote_path(temporary_path)}' (FORMAT PARQUET)"
+        )
+    finally:
+        connection.close()
+    temporary_path.replace(parquet_path)
+
+
+def write_sample_parquet(directory: Path, sample_size: int) -> None:
+    """
+    Builds `prices_sample.parquet` file with stratified sample of prices
+    from `prices.parquet` and `codes.parquet` files
+
+    :param directory: directory with `prices.parquet` and `codes.parquet` files
+    :type directory: Path
+    :param sample_size: maximal amount of sampled prices per stratum
+    :type sample_size: int
+    """
+    connection = duckdb.connect()
+    try:
+        for table in TABLES:
+            table_path = quote_path(directory.joinpath(f"{table}.parquet"))
+            connection.execute(
+                f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{table_path}')"
+            )
+        # several API workers may refresh the sample at the same time
+        sample_path = directory.joinpath(f"{SAMPLE_TABLE}.parquet")
+        with replaced_file(sample_path) as temporary_path:
+            connection.execute(
+                f"COPY ({get_prices_sample_query(sample_size)} "
+                f"ORDER BY {TABLE_ORDER[SAMPLE_TABLE]}) "
+                f"TO '{quote_path(temporary_path)}' (FORMAT PARQUET)"
+            )
+    finally:
+        connection.close()
+
+
+def refresh_sample_parquet(directory: Path, sample_size: int) -> None:
+    """
+    Rebuilds `prices_sample.parquet` file if `prices.parquet` or `codes.parquet`
+    files were changed after it was built
+
+    :param directory: directory with Parquet files
+    :type directory: Path
+    :param sample_size: maximal amount of sampled prices per stratum
+    :type sample_size: int
+    """
+    sample_path = directory.joinpath(f"{SAMPLE_TABLE}.parquet")
+    if sample_path.exists():
+        sample_modified_at = sample_path.stat().st_mtime_ns
+        tables_modified_at = (
+            directory.joinpath(f"{table}.parquet").stat().st_mtime_ns
+            for table in TABLES
+        )
+        if all(modified_at <= sample_modified_at for modified_at in tables_modified_at):
+            return
+    write_sample_parquet(directory, sample_size)
+
+
+def quote_path(path: Path) -> str:
+    """
+    Escapes path to use it in DuckDB string literal
+
+    :param path: file path
+    :type path: Path
+    :return: path with escaped quotes
+    :rtype: str
+    """
+    return str(path).replace("'", "''")
+
+
+if __name__ == "__main__":
+    environment = Environment()
+    asyncio.run(
+        export_to_parquet(
+            get_shards(environment),
+            environment.duckdb_directory,
+            environment.prices_sample_size,
+        )
+    )
@@ -0,0 +1,231 @@
+import asyncio
+from itertools import chain
+from typing import Hashable, List, Sequence
+
+from rates.app.models import RatesRequest
+from rates.database.backends.base import (
+    DayEstimate,
+    DayTotal,
+    PricesBackend,
+    RouteCoverageRow,
+)
+from rates.database.sample import refresh_prices_sample
+from rates.database.shards import Shards
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class PostgresBackend(PricesBackend):
+    """
+    Postgres storage, queries are sent to shards concurrently and their partial
+    aggregates are returned together
+    """
+
+    def __init__(self, shards: Shards) -> None:
+        self.shards = shards
+
+    async def get_day_totals(self, request: RatesRequest) -> List[DayTotal]:
+        shards_day_totals = await asyncio.gather(
+            *(
+                get_shard_day_totals(engine, request)
+                for engine in self.shards.get_engines(request.origin)
+            )
+        )
+        return list(chain.from_iterable(shards_day_totals))
+
+    async def get_day_estimates(self, request: RatesRequest) -> List[DayEstimate]:
+        shards_day_estimates = await asyncio.gather(
+            *(
+                get_shard_day_estimates(engine, request)
+                for engine in self.shards.get_engines(request.origin)
+            )
+        )
+        return list(chain.from_iterable(shards_day_estimates))
+
+    async def refresh_prices_sample(self, sample_size: int) -> None:
+        await refresh_prices_sample(self.shards, sample_size)
+
+    async def get_routes_coverage(self) -> List[RouteCoverageRow]:
+        shards_coverage = await asyncio.gather(
+            *(get_shard_coverage(engine) for engine in self.shards.engines.values())
+        )
+        return list(chain.from_iterable(shards_coverage))
+
+    async def get_version(self) -> Hashable:
+        return tuple(
+            await asyncio.gather(
+                *(
+                    get_shard_prices_version(engine)
+                    for engine in self.shards.engines.values()
+                )
+            )
+        )
+
+
+async def get_shard_day_totals(
+    engine: AsyncEngine, request: RatesRequest
+) -> Sequence[DayTotal]:
+    """
+    Fetches day, sum of prices and prices amount for given keys and dates
+    from a shard, only days that have prices are returned
+
+    :param engine: sqlalchemy engine instance of a shard
+    :type engine: AsyncEngine
+    :param request: request with origin, destination and date range
+    :type request: RatesRequest
+    :return: sequence of rows with day, sum of prices and prices amount
+    :rtype: Sequence[DayTotal]
+    """
+    async with engine.connect() as connection:
+        day_totals_query = await connection.execute(
+            text(
+                """
+                SELECT day, sum(price) AS prices_sum, count(price) AS prices_count
+                FROM prices
+                JOIN (SELECT code FROM codes WHERE key = :origin) origin_codes
+                    ON orig_code = origin_codes.code
+                JOIN (SELECT code FROM codes WHERE key = :destination) dest_codes
+                    ON prices.dest_code = dest_codes.code
+                WHERE day BETWEEN :date_from AND :date_to
+                GROUP BY day
+                """
+            ),
+            {
+                "origin": request.origin,
+                "destination": request.destination,
+                "date_from": request.date_from,
+                "date_to": request.date_to,
+            },
+        )
+        return [tuple(row) for row in day_totals_query.all()]
+
+
+async def get_shard_day_estimates(
+    engine: AsyncEngine, request: RatesRequest
+) -> Sequence[DayEstimate]:
+    """
+    Fetches estimated sums of prices per day for given keys and dates
+    from `prices_sample` of a shard
+
+    Strata of a day are combined in the database, so only one row per day is
+    returned: sum of prices is estimated as a sum of strata sample means
+    multiplied by strata prices amounts, its variance is a sum of strata sample
+    variances with finite population correction, so fully sampled strata don't
+    add any error. Requests with a port can't be answered from the sample (its
+    strata are port regions), so their prices are summed from `prices` exactly,
+    such requests are small anyway
+
+    :param engine: sqlalchemy engine instance of a shard
+    :type engine: AsyncEngine
+    :param request: request with origin, destination and date range
+    :type request: RatesRequest
+    :return: sequence of rows with day, prices amount, sample size, estimated
+    sum of prices and its variance
+    :rtype: Sequence[DayEstimate]
+    """
+    async with engine.connect() as connection:
+        day_estimates_query = await connection.execute(
+            text(
+                """
+                WITH request_ports AS (
+                    SELECT EXISTS (
+                        SELECT 1 FROM codes WHERE key = :origin AND code = :origin
+                    ) OR EXISTS (
+                        SELECT 1 FROM codes
+                        WHERE key = :destination AND code = :destination
+                    ) AS has_port
+                )
+                SELECT day, sum(prices_count) AS prices_count,
+                    sum(sample_size) AS sample_size,
+                    sum(prices_count * mean_price) AS prices_sum,
+                    sum(
+                        prices_count * (prices_count - sample_size)
+                        * sample_variance / sample_size
+                    ) AS prices_sum_variance
+                FROM (
+                    SELECT day, prices_count, count(price) AS sample_size,
+                        avg(price) AS mean_price,
+                        coalesce(var_samp(price), 0) AS sample_variance
+                    FROM prices_sample
+                    JOIN (SELECT code FROM codes WHERE key = :origin) origin_codes
+                        ON orig_code = origin_codes.code
+                    JOIN (SELECT code FROM codes WHERE key = :destination) dest_codes
+                        ON prices_sample.dest_code = dest_codes.code
+                    WHERE day BETWEEN :date_from AND :date_to
+                        AND NOT (SELECT has_port FROM request_ports)
+                    GROUP BY orig_region, dest_region, day, prices_count
+                    UNION ALL
+                    SELECT day, count(price), count(price), avg(price), 0
+                    FROM prices
+                    JOIN (SELECT code FROM codes WHERE key = :origin) origin_codes
+                        ON orig_code = origin_codes.code
+                    JOIN (SELECT code FROM codes WHERE key = :destination) dest_codes
+                        ON prices.dest_code = dest_codes.code
+                    WHERE day BETWEEN :date_from AND :date_to
+                        AND (SELECT has_port FROM request_ports)
+                    GROUP BY day
+                ) strata
+                GROUP BY day
+                """
+            ),
+            {
+                "origin": request.origin,
+                "destination": request.destination,
+                "date_from": request.date_from,
+                "date_to": request.date_to,
+            },
+        )
+        return [tuple(row) for row in day_estimates_query.all()]
+
+
+async def get_shard_coverage(engine: AsyncEngine) -> Sequence[RouteCoverageRow]:
+    """
+    Fetches first day, last day and prices amount for every route of a shard
+
+    :param engine: sqlalchemy engine instance of a shard
+    :type engine: AsyncEngine
+    :return: sequence of rows with origin key, destination key, first day,
+    last day and prices amount
+    :rtype: Sequence[RouteCoverageRow]
+    """
+    async with engine.connect() as connection:
+        coverage_query = await connection.execute(
+            text(
+                """
+                SELECT origin_codes.key, destination_codes.key,
+                    min(day), max(day), count(price)
+                FROM prices
+                JOIN codes origin_codes ON orig_code = origin_codes.code
+                JOIN codes destination_codes ON dest_code = destination_codes.code
+                GROUP BY origin_codes.key, destination_codes.key
+                """
+            )
+        )
+        return [tuple(row) for row in coverage_query.all()]
+
+
+async def get_shard_prices_version(engine: AsyncEngine) -> Sequence[Hashable]:
+    """
+    Fetches version of `prices` table of a shard
+
+    Version consists of the amount of inserted, updated and deleted rows from
+    statistics collector and table file node (changes on `TRUNCATE`), so it's
+    cheap to get but changes with a small delay after prices are changed
+
+    :param engine: sqlalchemy engine instance of a shard
+    :type engine: AsyncEngine
+    :return: row with version values
+    :rtype: Sequence[Hashable]
+    """
+    async with engine.connect() as connection:
+        version_query = await connection.execute(
+            text(
+                """
+                SELECT n_tup_ins + n_tup_upd + n_tup_del,
+                    pg_relation_filenode('prices')
+                FROM pg_stat_user_tables
+                WHERE relid = 'prices'::regclass
+                """
+            )
+        )
+        return tuple(version_query.one())
@@ -0,0 +1,125 @@
+import asyncio
+
+from rates.database.shards import Shards, get_shards
+from rates.utils.environment import Environment
+from sqlalchemy import text
+
+CREATE_PRICES_SAMPLE_QUERIES = (
+    "CREATE TABLE IF NOT EXISTS prices_sample ("
+    "   orig_code text NOT NULL, "
+    "   dest_code text NOT NULL, "
+    "   orig_region text NOT NULL, "
+    "   dest_region text NOT NULL, "
+    "   day date NOT NULL, "
+    "   price integer NOT NULL, "
+    "   prices_count integer NOT NULL "
+    ")",
+    "CREATE INDEX IF NOT EXISTS prices_sample_route_day_idx "
+    "ON prices_sample (orig_code, dest_code, day)",
+)
+# key of advisory lock that is held while sample of a shard is rebuilt
+REFRESH_LOCK_KEY = 5_130_933
+
+# the smallest region of every port, regions are nested, so any region either
+# contains all ports of port region or none of them
+PORT_REGIONS_QUERY = """
+    SELECT code, key AS region
+    FROM (
+        SELECT codes.code, codes.key,
+            row_number() OVER (
+                PARTITION BY codes.code ORDER BY regions.ports_count, codes.key
+            ) AS region_number
+        FROM codes
+        JOIN (SELECT key, count(*) AS ports_count FROM codes GROUP BY key) regions
+            ON codes.key = regions.key
+        WHERE codes.key <> codes.code
+    ) numbered_regions
+    WHERE region_number = 1
+"""
+
+
+def get_prices_sample_query(sample_size: int) -> str:
+    """
+    Creates query that selects stratified sample of `prices`
+
+    Every pair of origin and destination port regions (the smallest regions
+    of ports, ports without region are regions themselves) and day is a stratum,
+    at most `sample_size` random prices are selected from each of them together
+    with the amount of prices in the stratum. Region keys contain either whole
+    strata or none of their prices, so sample of any region to region request
+    consists of whole strata. Query works both in Postgres and DuckDB
+
+    :param sample_size: maximal amount of prices selected from a stratum
+    :type sample_size: int
+    :return: query with `orig_code`, `dest_code`, `orig_region`, `dest_region`,
+    `day`, `price` and `prices_count` columns
+    :rtype: str
+    """
+    return f"""
+        SELECT orig_code, dest_code, orig_region, dest_region, day, price,
+            prices_count
+        FROM (
+            SELECT orig_code, dest_code, orig_region, dest_region, day, price,
+                row_number() OVER (
+                    PARTITION BY orig_region, dest_region, day ORDER BY random()
+                ) AS sample_number,
+                count(*) OVER (
+                    PARTITION BY orig_region, dest_region, day
+                ) AS prices_count
+            FROM (
+                SELECT orig_code, dest_code, day, price,
+                    coalesce(origin_regions.region, orig_code) AS orig_region,
+                    coalesce(destination_regions.region, dest_code) AS dest_region
+                FROM prices
+                LEFT JOIN ({PORT_REGIONS_QUERY}) origin_regions
+                    ON orig_code = origin_regions.code
+                LEFT JOIN ({PORT_REGIONS_QUERY}) destination_regions
+                    ON dest_code = destination_regions.code
+            ) regional_prices
+        ) numbered_prices
+        WHERE sample_number <= {int(sample_size)}
+    """
+
+
+async def refresh_prices_sample(shards: Shards, sample_size: int) -> None:
+    """
+    Rebuilds `prices_sample` table from `prices` on every shard
+
+    Sample is replaced in a transaction, so queries read either the old
+    or the new sample. It should be refreshed after prices are changed, shard
+    which sample is being rebuilt by another process (e.g. another API worker
+    that noticed the same change) is skipped
+
+    :param shards: shards with engines
+    :type shards: Shards
+    :param sample_size: maximal amount of prices stored per stratum
+    :type sample_size: int
+    """
+    for engine in shards.engines.values():
+        async with engine.connect() as connection:
+            for query in CREATE_PRICES_SAMPLE_QUERIES:
+                await connection.execute(text(query))
+            await connection.commit()
+            lock_query = await connection.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"),
+                {"key": REFRESH_LOCK_KEY},
+            )
+            if not lock_query.scalar():
+                await connection.rollback()
+                continue
+            await connection.execute(text("DELETE FROM prices_sample"))
+            await connection.execute(
+                text(
+                    "INSERT INTO prices_sample (orig_code, dest_code, orig_region, "
+                    "dest_region, day, price, prices_count) "
+                    f"{get_prices_sample_query(sample_size)}"
+                )
+            )
+            await connection.commit()
+
+
+if __name__ == "__main__":
+    environment = Environment()
+    asyncio.run(
+        refresh_prices_sample(get_shards(environment), environment.prices_sample_size)
+    )
@@ -0,0 +1,128 @@
+import asyncio
+from typing import Dict, List, Mapping, Optional
+
+from rates.database.engine import get_engine
+from rates.utils.environment import Environment
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+# name of the shard that is stored in the database from `DB_*` variables
+DEFAULT_SHARD = "default"
+
+
+class Shards:
+    """
+    Engines of database nodes that `prices` are split across by origin port
+
+    Every node stores `prices` for its origin ports and a full copy of `codes`
+    """
+
+    def __init__(
+        self, engines: Mapping[str, AsyncEngine], shard_map: Mapping[str, str]
+    ) -> None:
+        if DEFAULT_SHARD not in engines:
+            raise ValueError(f"engine for `{DEFAULT_SHARD}` shard is required")
+        if unknown_shards := set(shard_map.values()) - set(engines):
+            raise ValueError(
+                f"shard map references unknown shards: {sorted(unknown_shards)}"
+            )
+        self.engines: Dict[str, AsyncEngine] = dict(engines)
+        self.shard_map: Dict[str, str] = dict(shard_map)
+
+    @property
+    def default_engine(self) -> AsyncEngine:
+        return self.engines[DEFAULT_SHARD]
+
+    def get_shard(self, port: str) -> str:
+        """
+        Returns name of the shard that stores prices for given origin port
+
+        :param port: origin port code
+        :type port: str
+        :return: shard name
+        :rtype: str
+        """
+        return self.shard_map.get(port, DEFAULT_SHARD)
+
+    def get_engines(self, origin: str) -> List[AsyncEngine]:
+        """
+        Returns engines of shards that may store prices for given origin
+
+        :param origin: region slug or port code of origin
+        :type origin: str
+        :return: list of engines, single engine if origin is a port from shard map
+        :rtype: List[AsyncEngine]
+        """
+        if origin in self.shard_map:
+            return [self.engines[self.shard_map[origin]]]
+        # origin is either a region (its ports may be on any shard) or a port
+        # stored on default shard, it's impossible to tell without querying `codes`
+        return list(self.engines.values())
+
+
+def get_shards(environment: Optional[Environment] = None) -> Shards:
+    """
+    Creates engines for default database and shards from environment
+
+    :param environment: environment with database settings
+    :type environment: Optional[Environment]
+    :return: shards with engines
+    :rtype: Shards
+    """
+    environment = environment or Environment()
+    engines = {DEFAULT_SHARD: get_engine()}
+    for name, database_url in environment.db_shards.items():
+        engines[name] = create_async_engine(database_url, future=True)
+    return Shards(engines, environment.db_shard_map)
+
+
+async def split_prices(shards: Shards) -> None:
+    """
+    Leaves on each node only prices of its origin ports and copies `codes`
+    from default node to other nodes
+
+    Expects every node to start with a full copy of `prices` (e.g. created from
+    the same dump)
+
+    :param shards: shards with engines
+    :type shards: Shards
+    """
+    async with shards.default_engine.connect() as connection:
+        codes_query = await connection.execute(text("SELECT key, code FROM codes"))
+        codes = [dict(row) for row in codes_query.mappings()]
+
+    for name, engine in shards.engines.items():
+        mapped_ports = shards.shard_map.items()
+        own_ports = [port for port, shard in mapped_ports if shard == name]
+        other_ports = [port for port, shard in mapped_ports if shard != name]
+        async with engine.connect() as connection:
+            if name == DEFAULT_SHARD:
+                await connection.execute(
+                    text("DELETE FROM prices WHERE orig_code = ANY(:ports)"),
+                    {"ports": other_ports},
+                )
+            else:
+                await connection.execute(
+                    text("DELETE FROM prices WHERE orig_code <> ALL(:ports)"),
+                    {"ports": own_ports},
+                )
+                await connection.execute(
+                    text(
+                        "CREATE TABLE IF NOT EXISTS codes ("
+                        "   key text NOT NULL, "
+                        "   code text NOT NULL, "
+                        "   PRIMARY KEY (key, code) "
+                        ")"
+                    )
+                )
+                await connection.execute(text("DELETE FROM codes"))
+                if codes:
+                    await connection.execute(
+                        text("INSERT INTO codes (key, code) VALUES (:key, :code)"),
+                        codes,
+                    )
+            await connection.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(split_prices(get_shards()))
@@ -1,12 +1,133 @@
-from fastapi import Depends, FastAPI
-from rates.app.models import AveragePrices, RatesRequest, make_dependable
+from typing import Union
+
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import FileResponse, StreamingResponse
+from rates.app.approximate import get_approximate_average_prices
+from rates.app.cache import PricesCache
+from rates.app.coverage import CoverageIndex
+from rates.app.hot_routes import HotRoutes, prewarm_prices_cache
+from rates.app.models import (
+    ApproximateAveragePrices,
+    AveragePrices,
+    ProfileInfos,
+    RatesRequest,
+    make_dependable,
+)
 from rates.app.prices import get_average_prices
-from rates.database.engine import get_engine
+from rates.app.profiling import (
+    ProfileStore,
+    ProfilingMiddleware,
+    check_admin_request,
+    track_sql_timing,
+)
+from rates.app.subscriptions import SubscriptionHub, stream_events
+from rates.app.watcher import PricesWatcher
+from rates.database.backends import (
+    ChunkedBackend,
+    PostgresBackend,
+    get_backend,
+)
+from rates.utils.environment import Environment
 
+environment = Environment()
 app = FastAPI()
-engine = get_engine()
+backend = get_backend(environment)
+coverage_index = CoverageIndex()
+prices_cache = PricesCache(environment.prices_cache_size)
+hot_routes = HotRoutes(environment.hot_routes_capacity, environment.hot_routes_path)
+subscription_hub = SubscriptionHub(backend, coverage_index, prices_cache)
+prices_watcher = PricesWatcher(backend, environment.prices_version_check_interval)
+profile_store = ProfileStore(
+    environment.profiling_directory, environment.profiling_capacity
+)
+
+storage_backend = backend.backend if isinstance(backend, ChunkedBackend) else backend
+if isinstance(storage_backend, PostgresBackend):
+    for shard_engine in storage_backend.shards.engines.values():
+        track_sql_timing(shard_engine)
+app.add_middleware(ProfilingMiddleware, store=profile_store, environment=environment)
+
+
+async def prewarm_hot_routes():
+    await prewarm_prices_cache(
+        hot_routes.get_top(environment.hot_routes_prewarm),
+        backend,
+        coverage_index,
+        prices_cache,
+    )
+
+
+@prices_watcher.on_change
+async def refresh_prices_data():
+    # cache is invalidated after new coverage index is in place, so prices computed
+    # with the old index during reload are stored for the old generation only
+    await coverage_index.load(backend)
+    prices_cache.invalidate()
+    await subscription_hub.publish_changes()
+    await prewarm_hot_routes()
+    hot_routes.save()
+    # sample is rebuilt last, exact prices are refreshed first
+    await backend.refresh_prices_sample(environment.prices_sample_size)
+
+
+@app.on_event("startup")
+async def startup():
+    # store prices data version first to not miss changes made during loading
+    await prices_watcher.check()
+    await coverage_index.load(backend)
+    # prewarm cache for most frequent requests before taking traffic
+    hot_routes.load()
+    await prewarm_hot_routes()
+    prices_watcher.start()
 
 
-@app.get("/rates", response_model=AveragePrices)
+@app.on_event("shutdown")
+async def shutdown():
+    await prices_watcher.stop()
+    hot_routes.save()
+
+
+# approximate prices are listed first, so their extra fields are kept
+@app.get("/rates", response_model=Union[ApproximateAveragePrices, AveragePrices])
 async def rates(request: RatesRequest = Depends(make_dependable(RatesRequest))):
-    return await get_average_prices(engine, request)
+    if request.approximate:
+        # sample is small, so approximate prices aren't cached
+        return await get_approximate_average_prices(backend, request, coverage_index)
+    hot_routes.track(request)
+    return await get_average_prices(backend, request, coverage_index, prices_cache)
+
+
+@app.get("/rates/subscribe", response_class=StreamingResponse)
+async def subscribe_rates(
+    http_request: Request,
+    request: RatesRequest = Depends(make_dependable(RatesRequest)),
+):
+    if request.approximate:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="approximate average prices can't be subscribed to",
+        )
+    subscription = await subscription_hub.subscribe(request)
+    return StreamingResponse(
+        stream_events(
+            subscription_hub,
+            subscription,
+            http_request.is_disconnected,
+            environment.subscription_heartbeat_interval,
+        ),
+        media_type="text/event-stream",
+    )
+
+
+@app.get("/profiles", response_model=ProfileInfos)
+async def profiles(request: Request):
+    check_admin_request(request, environment)
+    return profile_store.list()
+
+
+@app.get("/profiles/{profile_id}", response_class=FileResponse)
+async def profile(profile_id: str, request: Request):
+    check_admin_request(request, environment)
+    if (path := profile_store.get_path(profile_id)) is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, filename=f"{profile_id}.prof")
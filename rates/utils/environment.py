@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Dict, Literal, Optional
 
 from pydantic import BaseSettings, Field
 
@@ -12,6 +13,64 @@ class Environment(BaseSettings):
     db_host: str = Field(env="DB_HOST", default="localhost")
     db_port: int = Field(env="DB_PORT", default=5432)
 
+    # `prices` can be split across several database nodes by origin port,
+    # `DB_SHARDS` maps shard name to database URL of additional node and
+    # `DB_SHARD_MAP` maps origin port code to shard name (both are JSON objects),
+    # prices for ports that aren't in shard map are stored in the database above
+    db_shards: Dict[str, str] = Field(env="DB_SHARDS", default={})
+    db_shard_map: Dict[str, str] = Field(env="DB_SHARD_MAP", default={})
+
+    # `prices` and `codes` storage, `duckdb` reads Parquet files exported
+    # to `DUCKDB_DIRECTORY` with `python -m rates.database.backends.columnar`
+    storage_backend: Literal["postgres", "duckdb"] = Field(
+        env="STORAGE_BACKEND", default="postgres"
+    )
+    duckdb_directory: Path = Field(
+        env="DUCKDB_DIRECTORY", default=PROJECT_ROOT.joinpath("data")
+    )
+    # date ranges longer than `CHUNK_DAYS` days are split into chunks queried
+    # concurrently, at most `CHUNK_PARALLELISM` per request and `CHUNK_CONCURRENCY`
+    # across all requests (`0` disables chunking)
+    chunk_days: int = Field(env="CHUNK_DAYS", default=0, ge=0)
+    chunk_parallelism: int = Field(env="CHUNK_PARALLELISM", default=4, gt=0)
+    chunk_concurrency: int = Field(env="CHUNK_CONCURRENCY", default=8, gt=0)
+    # approximate average prices are estimated from a sample with at most
+    # `PRICES_SAMPLE_SIZE` prices per port regions and day
+    prices_sample_size: int = Field(env="PRICES_SAMPLE_SIZE", default=10, ge=2)
+
+    # average prices are cached until `prices` are changed, version of `prices`
+    # is checked every `PRICES_VERSION_CHECK_INTERVAL` seconds
+    prices_cache_size: int = Field(env="PRICES_CACHE_SIZE", default=1000, ge=0)
+    prices_version_check_interval: float = Field(
+        env="PRICES_VERSION_CHECK_INTERVAL", default=30.0, gt=0.0
+    )
+    # most frequent requests are tracked and stored in `HOT_ROUTES_PATH`,
+    # `HOT_ROUTES_PREWARM` of them are recomputed on start and on `prices` change
+    hot_routes_capacity: int = Field(env="HOT_ROUTES_CAPACITY", default=100, gt=0)
+    hot_routes_prewarm: int = Field(env="HOT_ROUTES_PREWARM", default=20, ge=0)
+    hot_routes_path: Path = Field(
+        env="HOT_ROUTES_PATH", default=PROJECT_ROOT.joinpath("hot_routes.json")
+    )
+
+    # subscriptions get a comment every `SUBSCRIPTION_HEARTBEAT_INTERVAL` seconds
+    # when nothing has changed to keep connection alive
+    subscription_heartbeat_interval: float = Field(
+        env="SUBSCRIPTION_HEARTBEAT_INTERVAL", default=15.0, gt=0.0
+    )
+
+    # profiling is enabled for requests with admin token in `X-Profile-Token` header
+    # and for sampled fraction of all requests
+    profiling_admin_token: Optional[str] = Field(
+        env="PROFILING_ADMIN_TOKEN", default=None
+    )
+    profiling_sample_rate: float = Field(
+        env="PROFILING_SAMPLE_RATE", default=0.0, ge=0.0, le=1.0
+    )
+    profiling_directory: Path = Field(
+        env="PROFILING_DIRECTORY", default=PROJECT_ROOT.joinpath("profiles")
+    )
+    profiling_capacity: int = Field(env="PROFILING_CAPACITY", default=20, gt=0)
+
     class Config:
         env_file = PROJECT_ROOT.joinpath(".env")
         env_file_encoding = "utf-8"
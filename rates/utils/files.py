@@ -0,0 +1,28 @@
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+@contextmanager
+def replaced_file(path: Path) -> Iterator[Path]:
+    """
+    Yields unique temporary path in the directory of `path` and replaces `path`
+    with it when the block succeeds, so readers never see partially written file
+    and concurrent writers (e.g. several workers) don't overwrite each other's
+    temporary files
+
+    :param path: path of the file to replace
+    :type path: Path
+    :return: temporary path to write the file to
+    :rtype: Iterator[Path]
+    """
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    ) as temporary_file:
+        temporary_path = Path(temporary_file.name)
+    try:
+        yield temporary_path
+        temporary_path.replace(path)
+    finally:
+        temporary_path.unlink(missing_ok=True)
@@ -0,0 +1,71 @@
+import cProfile
+import pstats
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class RequestProfile:
+    """
+    Profile of a request together with profiles of work it runs in worker threads
+
+    `cProfile` profiles only the thread it's enabled in, so work sent to threads
+    with `run_profiled` gets its own profile that is merged when stats are taken
+    """
+
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add_thread_profile(self, profile: cProfile.Profile) -> None:
+        """
+        Adds finished profile of worker thread work
+
+        :param profile: finished worker thread profile
+        :type profile: cProfile.Profile
+        """
+        with self._lock:
+            self.thread_profiles.append(profile)
+
+    def get_stats(self) -> pstats.Stats:
+        """
+        Merges request and worker threads profiles
+
+        :return: merged profile stats
+        :rtype: pstats.Stats
+        """
+        stats = pstats.Stats(self.profile)
+        with self._lock:
+            for profile in self.thread_profiles:
+                stats.add(profile)
+        return stats
+
+
+request_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "request_profile", default=None
+)
+
+
+def run_profiled(func: Callable[..., T], *args: Any) -> T:
+    """
+    Runs function, profiles it if it's called in worker thread on behalf
+    of profiled request (e.g. with `asyncio.to_thread`, that copies context)
+
+    :param func: function to run
+    :type func: Callable[..., T]
+    :return: function result
+    :rtype: T
+    """
+    if (profile := request_profile.get()) is None:
+        return func(*args)
+
+    thread_profile = cProfile.Profile()
+    thread_profile.enable()
+    try:
+        return func(*args)
+    finally:
+        thread_profile.disable()
+        profile.add_thread_profile(thread_profile)
@@ -0,0 +1,120 @@
+import datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from rates.app.approximate import (
+    estimate_average_prices,
+    estimate_day_average_price,
+    get_approximate_average_prices,
+)
+from rates.app.coverage import CoverageIndex
+from rates.app.models import ApproximateAveragePrice
+from rates.database.backends.base import PricesBackend
+
+DAY = datetime.date(2022, 7, 1)
+
+
+class TestEstimateDayAveragePrice:
+    def test_fully_sampled_strata_give_exact_average_price(self):
+        # given
+        # prices 100, 200, 300 and 400, 600 fully sampled in two shards
+        estimates = [(3, 3, 600.0, 0.0), (2, 2, 1000.0, 0.0)]
+
+        # when
+        average_price = estimate_day_average_price(DAY, estimates)
+
+        # then
+        assert average_price == ApproximateAveragePrice(
+            day="2022-07-01",
+            average_price=320.0,
+            confidence_low=320.0,
+            confidence_high=320.0,
+            sample_size=5,
+        )
+
+    def test_partially_sampled_strata_give_confidence_interval(self):
+        # given
+        # 2 of 10 prices sampled (100 and 300) and fully sampled 1000, 1000, 1000
+        estimates = [(10, 2, 2000.0, 10 * 8 * 20000 / 2), (3, 3, 3000.0, 0.0)]
+
+        # when
+        average_price = estimate_day_average_price(DAY, estimates)
+
+        # then
+        # mean is (10 * 200 + 3 * 1000) / 13, margin is
+        # 1.96 * sqrt(10 * 8 * 20000 / 2) / 13 (about 134.85)
+        assert average_price.average_price == 384.62
+        assert average_price.confidence_low == 249.77
+        assert average_price.confidence_high == 519.47
+        assert average_price.sample_size == 5
+
+    def test_day_with_less_than_three_prices_has_null_average_price(self):
+        # given
+        estimates = [(1, 1, 100.0, 0.0), (1, 1, 200.0, 0.0)]
+
+        # when
+        average_price = estimate_day_average_price(DAY, estimates)
+
+        # then
+        # the same rule as for exact average prices
+        assert average_price == ApproximateAveragePrice(
+            day="2022-07-01",
+            average_price=None,
+            confidence_low=None,
+            confidence_high=None,
+            sample_size=2,
+        )
+
+
+class TestEstimateAveragePrices:
+    def test_estimate_average_prices_merges_shards_and_fills_days(self):
+        # given
+        # Postgres returns sums as numeric
+        day_estimates = [
+            (DAY, 2, 2, Decimal(300), Decimal(0)),
+            (DAY, 1, 1, 300.0, 0.0),
+        ]
+
+        # when
+        average_prices = estimate_average_prices(
+            day_estimates, DAY, DAY + datetime.timedelta(days=1)
+        )
+
+        # then
+        assert [price.average_price for price in average_prices] == [200.0, None]
+        assert [price.sample_size for price in average_prices] == [3, 0]
+
+
+class TestGetApproximateAveragePrices:
+    @pytest.mark.asyncio
+    async def test_route_without_coverage_isnt_queried(self, make_request):
+        # given
+        backend = MagicMock(PricesBackend)
+        backend.get_day_estimates = AsyncMock()
+        coverage_index = CoverageIndex()
+        coverage_index.loaded = True
+        request = make_request(approximate=True)
+
+        # when
+        average_prices = await get_approximate_average_prices(
+            backend, request, coverage_index
+        )
+
+        # then
+        backend.get_day_estimates.assert_not_awaited()
+        assert [price.average_price for price in average_prices] == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_clipped_request_is_queried(self, make_request):
+        # given
+        backend = MagicMock(PricesBackend)
+        backend.get_day_estimates = AsyncMock(return_value=[(DAY, 3, 3, 600.0, 0.0)])
+        request = make_request(approximate=True)
+
+        # when
+        average_prices = await get_approximate_average_prices(backend, request)
+
+        # then
+        backend.get_day_estimates.assert_awaited_once_with(request)
+        assert [price.average_price for price in average_prices] == [200.0, None]
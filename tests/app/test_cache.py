@@ -0,0 +1,49 @@
+from rates.app.cache import PricesCache, get_key_request, get_request_key
+from rates.app.models import AveragePrice
+
+
+class TestGetRequestKey:
+    def test_get_request_key(self, make_request):
+        assert get_request_key(make_request(origin=" some_region ")) == (
+            "some_region",
+            "some_port_2",
+            "2022-07-01",
+            "2022-07-02",
+        )
+
+    def test_get_key_request(self, make_request):
+        request = make_request(origin="some_region")
+        assert get_key_request(get_request_key(request)) == request
+
+
+class TestPricesCache:
+    def test_prices_cache_evicts_least_recently_used_request(self, make_request):
+        # given
+        cache = PricesCache(max_size=2)
+        average_prices = [AveragePrice(day="2022-07-01", average_price=1.0)]
+        cache.set(make_request(origin="port_1"), average_prices, cache.generation)
+        cache.set(make_request(origin="port_2"), average_prices, cache.generation)
+
+        # when
+        cache.get(make_request(origin="port_1"))
+        cache.set(make_request(origin="port_3"), average_prices, cache.generation)
+
+        # then
+        assert len(cache) == 2
+        assert cache.get(make_request(origin="port_1")) == average_prices
+        assert cache.get(make_request(origin="port_2")) is None
+        assert cache.get(make_request(origin="port_3")) == average_prices
+
+    def test_prices_cache_ignores_prices_from_previous_generation(self, make_request):
+        # given
+        cache = PricesCache(max_size=2)
+        average_prices = [AveragePrice(day="2022-07-01", average_price=1.0)]
+        cache.set(make_request(origin="port_1"), average_prices, cache.generation)
+        generation = cache.generation
+
+        # when
+        cache.invalidate()
+        cache.set(make_request(origin="port_2"), average_prices, generation)
+
+        # then
+        assert len(cache) == 0, "prices computed before invalidation should be ignored"
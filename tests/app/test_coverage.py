@@ -0,0 +1,76 @@
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from rates.app.coverage import CoverageIndex, RouteCoverage
+from rates.database.backends.base import PricesBackend
+
+
+class TestCoverageIndex:
+    @pytest.mark.asyncio
+    async def test_load_merges_routes_coverage(self):
+        # given
+        backend_mock = MagicMock(PricesBackend)
+        backend_mock.get_routes_coverage = AsyncMock(
+            return_value=[
+                # partial coverage from different shards
+                (
+                    "some_region",
+                    "some_port_2",
+                    datetime.date(2022, 7, 5),
+                    datetime.date(2022, 7, 20),
+                    10,
+                ),
+                (
+                    "some_region",
+                    "some_port_2",
+                    datetime.date(2022, 7, 1),
+                    datetime.date(2022, 7, 10),
+                    42,
+                ),
+            ]
+        )
+        coverage_index = CoverageIndex()
+
+        # when
+        await coverage_index.load(backend_mock)
+
+        # then
+        assert coverage_index.loaded
+        assert coverage_index.get("some_region", "some_port_2") == RouteCoverage(
+            datetime.date(2022, 7, 1), datetime.date(2022, 7, 20), 52
+        ), "route coverage should be merged"
+        assert coverage_index.get("some_port_2", "some_region") is None
+
+    def test_clip_request(self, make_request):
+        # given
+        coverage_index = CoverageIndex()
+        coverage_index._routes[("some_port_1", "some_port_2")] = RouteCoverage(
+            datetime.date(2022, 7, 5), datetime.date(2022, 7, 10), 42
+        )
+
+        # when & then
+        assert coverage_index.clip_request(
+            make_request("2022-07-01", "2022-07-31")
+        ) == make_request(
+            "2022-07-05", "2022-07-10"
+        ), "date range should be shrunk to route coverage"
+        request = make_request("2022-07-06", "2022-07-07")
+        assert (
+            coverage_index.clip_request(request) is request
+        ), "request inside of route coverage shouldn't be changed"
+        assert (
+            coverage_index.clip_request(make_request("2022-07-11", "2022-07-31"))
+            is None
+        ), "request outside of route coverage should have no prices"
+        assert (
+            coverage_index.clip_request(
+                make_request(
+                    "2022-07-01",
+                    "2022-07-31",
+                    origin="some_port_2",
+                    destination="some_port_1",
+                )
+            )
+            is None
+        ), "request for route without prices should have no prices"
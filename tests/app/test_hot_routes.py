@@ -0,0 +1,100 @@
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from rates.app.cache import PricesCache
+from rates.app.coverage import CoverageIndex
+from rates.app.hot_routes import HotRoutes, SpaceSaving, prewarm_prices_cache
+from rates.database.backends.base import PricesBackend
+
+
+class TestSpaceSaving:
+    def test_space_saving_tracks_heavy_hitters(self):
+        # given
+        sketch: SpaceSaving[str] = SpaceSaving(capacity=2)
+
+        # when
+        for key in ["a", "a", "a", "b", "c", "a", "d"]:
+            sketch.add(key)
+
+        # then
+        assert len(sketch.counts) == 2, "sketch should track at most capacity keys"
+        assert sketch.top(1) == [("a", 4)]
+        # "d" replaced "c" that replaced "b", so it inherited their counts
+        assert sketch.counts["d"] == 3
+        assert sketch.errors["d"] == 2
+
+
+class TestHotRoutes:
+    def test_hot_routes_persistence(self, tmp_path: Path, make_request):
+        # given
+        path = tmp_path.joinpath("hot_routes.json")
+        hot_routes = HotRoutes(capacity=10, path=path)
+        for origin in ["port_1", "port_2", "port_2"]:
+            hot_routes.track(make_request(origin=origin))
+
+        # when
+        hot_routes.save()
+        loaded_hot_routes = HotRoutes(capacity=1, path=path)
+        loaded_hot_routes.load()
+
+        # then
+        assert loaded_hot_routes.get_top(10) == [
+            make_request(origin="port_2")
+        ], "only most frequent requests within capacity should be loaded"
+        assert list(tmp_path.iterdir()) == [path], "temporary file shouldn't be left"
+
+    def test_hot_routes_ignore_invalid_file(self, tmp_path: Path):
+        # given
+        path = tmp_path.joinpath("hot_routes.json")
+        path.write_text("{")
+        hot_routes = HotRoutes(capacity=10, path=path)
+
+        # when
+        hot_routes.load()
+
+        # then
+        assert hot_routes.get_top(10) == []
+
+    def test_hot_routes_ignore_invalid_requests(self, tmp_path: Path, make_request):
+        # given
+        path = tmp_path.joinpath("hot_routes.json")
+        path.write_text(
+            json.dumps(
+                [
+                    [["port_1", "some_port_2", "2022-07-01", "2022-07-02"], 5, 0],
+                    # `date_from` is after `date_to`
+                    [["port_2", "some_port_2", "2022-07-02", "2022-07-01"], 4, 0],
+                    [["port_3", "some_port_2", "not a date", "2022-07-01"], 3, 0],
+                    [["port_4", "some_port_2"], 2, 0],
+                ]
+            )
+        )
+        hot_routes = HotRoutes(capacity=10, path=path)
+
+        # when
+        hot_routes.load()
+
+        # then
+        assert hot_routes.get_top(10) == [make_request(origin="port_1")]
+
+
+class TestPrewarmPricesCache:
+    @pytest.mark.asyncio
+    async def test_prewarm_prices_cache(self, make_request):
+        # given
+        with patch("rates.app.hot_routes.get_average_prices") as get_average_prices:
+            backend_mock = MagicMock(PricesBackend)
+            coverage_index = CoverageIndex()
+            cache = PricesCache(max_size=10)
+
+            # when
+            await prewarm_prices_cache(
+                [make_request(origin="port_1")], backend_mock, coverage_index, cache
+            )
+
+            # then
+            get_average_prices.assert_awaited_once_with(
+                backend_mock, make_request(origin="port_1"), coverage_index, cache
+            )
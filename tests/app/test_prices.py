@@ -1,15 +1,20 @@
 import datetime
 from decimal import Decimal
-from unittest.mock import ANY, AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from rates.app.cache import PricesCache
+from rates.app.coverage import CoverageIndex, RouteCoverage
 from rates.app.models import AveragePrice, RatesRequest
 from rates.app.prices import (
     get_average_prices,
     get_day_average_price,
+    get_empty_days,
+    get_prices_for_request,
+    merge_day_totals,
     process_prices,
 )
-from sqlalchemy.engine import Engine
+from rates.database.backends.base import PricesBackend
 
 
 class TestGetAveragePrices:
@@ -23,7 +28,7 @@ class TestGetAveragePrices:
                 (datetime.date(2022, 7, 2), Decimal(200), 4),
             ],
         ) as get_prices_for_request_patch:
-            async_engine_mock = AsyncMock(Engine)
+            backend_mock = MagicMock(PricesBackend)
 
             request = RatesRequest(
                 date_from="2022-07-01",
@@ -33,13 +38,11 @@ class TestGetAveragePrices:
             )
 
             # when
-            average_prices = await get_average_prices(async_engine_mock, request)
+            average_prices = await get_average_prices(backend_mock, request)
 
             # then
-            # connection should be created
-            async_engine_mock.connect.assert_called_once()
-            # get_prices_for_request should be called with connection and request
-            get_prices_for_request_patch.assert_awaited_once_with(ANY, request)
+            # get_prices_for_request should be called with backend and request
+            get_prices_for_request_patch.assert_awaited_once_with(backend_mock, request)
             expected_prices = [
                 AveragePrice(  # day has less than three prices
                     day="2022-07-01", average_price=None
@@ -48,6 +51,171 @@ class TestGetAveragePrices:
             ]
             assert expected_prices == average_prices
 
+    @pytest.mark.asyncio
+    async def test_get_average_prices_skips_database_for_route_without_prices(self):
+        # given
+        with patch(
+            "rates.app.prices.get_prices_for_request"
+        ) as get_prices_for_request_patch:
+            backend_mock = MagicMock(PricesBackend)
+            coverage_index = CoverageIndex()
+            coverage_index.loaded = True
+
+            request = RatesRequest(
+                date_from="2022-07-01",
+                date_to="2022-07-02",
+                origin="some_port_1",
+                destination="some_port_2",
+            )
+
+            # when
+            average_prices = await get_average_prices(
+                backend_mock, request, coverage_index
+            )
+
+            # then
+            # database shouldn't be queried
+            get_prices_for_request_patch.assert_not_called()
+            assert average_prices == [
+                AveragePrice(day="2022-07-01", average_price=None),
+                AveragePrice(day="2022-07-02", average_price=None),
+            ]
+
+    @pytest.mark.asyncio
+    async def test_get_average_prices_clips_date_range_to_route_coverage(self):
+        # given
+        with patch(
+            "rates.app.prices.get_prices_for_request",
+            return_value=[(datetime.date(2022, 7, 2), Decimal(200), 4)],
+        ) as get_prices_for_request_patch:
+            backend_mock = MagicMock(PricesBackend)
+            coverage_index = CoverageIndex()
+            coverage_index._routes[("some_port_1", "some_port_2")] = RouteCoverage(
+                datetime.date(2022, 7, 2), datetime.date(2022, 7, 2), 4
+            )
+            coverage_index.loaded = True
+
+            request = RatesRequest(
+                date_from="2022-07-01",
+                date_to="2022-07-03",
+                origin="some_port_1",
+                destination="some_port_2",
+            )
+
+            # when
+            average_prices = await get_average_prices(
+                backend_mock, request, coverage_index
+            )
+
+            # then
+            # only covered days should be queried
+            get_prices_for_request_patch.assert_awaited_once_with(
+                backend_mock,
+                RatesRequest(
+                    date_from="2022-07-02",
+                    date_to="2022-07-02",
+                    origin="some_port_1",
+                    destination="some_port_2",
+                ),
+            )
+            assert average_prices == [
+                AveragePrice(day="2022-07-01", average_price=None),
+                AveragePrice(day="2022-07-02", average_price=200.0),
+                AveragePrice(day="2022-07-03", average_price=None),
+            ]
+
+    @pytest.mark.asyncio
+    async def test_get_average_prices_uses_cache(self):
+        # given
+        with patch(
+            "rates.app.prices.get_prices_for_request",
+            return_value=[(datetime.date(2022, 7, 1), Decimal(100), 3)],
+        ) as get_prices_for_request_patch:
+            backend_mock = MagicMock(PricesBackend)
+            cache = PricesCache(max_size=10)
+
+            request = RatesRequest(
+                date_from="2022-07-01",
+                date_to="2022-07-01",
+                origin="some_port_1",
+                destination="some_port_2",
+            )
+
+            # when
+            first_average_prices = await get_average_prices(
+                backend_mock, request, cache=cache
+            )
+            second_average_prices = await get_average_prices(
+                backend_mock, request, cache=cache
+            )
+
+            # then
+            # database should be queried only once
+            get_prices_for_request_patch.assert_awaited_once()
+            assert first_average_prices == second_average_prices
+            assert cache.get(request) == [
+                AveragePrice(day="2022-07-01", average_price=100.0)
+            ]
+
+
+class TestGetPricesForRequest:
+    @pytest.mark.asyncio
+    async def test_get_prices_for_request_merges_day_totals(self):
+        # given
+        backend_mock = MagicMock(PricesBackend)
+        backend_mock.get_day_totals = AsyncMock(
+            return_value=[
+                # partial aggregates from different shards
+                (datetime.date(2022, 7, 1), 300, 2),
+                (datetime.date(2022, 7, 1), 100, 1),
+                (datetime.date(2022, 7, 3), 600, 3),
+            ]
+        )
+        request = RatesRequest(
+            date_from="2022-07-01",
+            date_to="2022-07-03",
+            origin="china_main",
+            destination="some_port",
+        )
+
+        # when
+        prices = await get_prices_for_request(backend_mock, request)
+
+        # then
+        backend_mock.get_day_totals.assert_awaited_once_with(request)
+        assert prices == [
+            (datetime.date(2022, 7, 1), Decimal(400) / 3, 3),
+            (datetime.date(2022, 7, 2), Decimal(0), 0),
+            (datetime.date(2022, 7, 3), Decimal(200), 3),
+        ]
+
+
+class TestMergeDayTotals:
+    def test_merge_day_totals(self):
+        assert merge_day_totals(
+            [
+                (datetime.date(2022, 7, 2), 10, 1),
+                (datetime.date(2022, 7, 2), 20, 1),
+                (datetime.date(2022, 7, 3), 5, 1),
+            ],
+            datetime.date(2022, 7, 1),
+            datetime.date(2022, 7, 2),
+        ) == [
+            (datetime.date(2022, 7, 1), Decimal(0), 0),
+            (datetime.date(2022, 7, 2), Decimal(15), 2),
+        ], "days should be merged and filled for the period only"
+
+
+class TestGetEmptyDays:
+    def test_get_empty_days(self):
+        assert get_empty_days(datetime.date(2022, 7, 1), datetime.date(2022, 7, 2)) == [
+            (datetime.date(2022, 7, 1), Decimal(0), 0),
+            (datetime.date(2022, 7, 2), Decimal(0), 0),
+        ]
+        assert (
+            get_empty_days(datetime.date(2022, 7, 2), datetime.date(2022, 7, 1)) == []
+        ), "period with end before start should have no days"
+
 
 class TestGetDayAveragePrice:
     def test_get_day_average_price(self):
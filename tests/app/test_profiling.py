@@ -0,0 +1,219 @@
+import cProfile
+import pstats
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from fastapi import Depends, FastAPI, status
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from rates.app.models import ProfileInfo, RatesRequest, make_dependable
+from rates.app.profiling import (
+    PROFILE_TOKEN_HEADER,
+    ProfileStore,
+    ProfilingMiddleware,
+    SqlTiming,
+    sql_timing,
+    track_sql_timing,
+)
+from rates.utils.environment import Environment
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+def make_stats():
+    profile = cProfile.Profile()
+    profile.enable()
+    profile.disable()
+    return pstats.Stats(profile)
+
+
+def get_profiled_functions(path):
+    return {function for _, _, function in pstats.Stats(str(path)).stats}
+
+
+def make_profile_info(profile_id: str) -> ProfileInfo:
+    return ProfileInfo(
+        id=profile_id,
+        method="GET",
+        path="/rates",
+        query="",
+        started_at=datetime(2022, 7, 1, tzinfo=timezone.utc),
+        duration=0.1,
+        sql_duration=0.05,
+        sql_queries=1,
+    )
+
+
+class TestProfileStore:
+    def test_profile_store_keeps_newest_profiles(self, tmp_path: Path):
+        # given
+        store = ProfileStore(tmp_path, capacity=2)
+        profile_ids = [f"100{index}-0000000{index}" for index in range(3)]
+
+        # when
+        for profile_id in profile_ids:
+            store.save(make_stats(), make_profile_info(profile_id))
+
+        # then
+        assert [info.id for info in store.list()] == [
+            profile_ids[2],
+            profile_ids[1],
+        ], "only newest profiles within capacity should be kept"
+        assert store.get_path(profile_ids[0]) is None
+        assert store.get_path(profile_ids[2]) == tmp_path.joinpath(
+            f"{profile_ids[2]}.prof"
+        )
+
+    def test_profile_store_skips_invalid_profile_info(self, tmp_path: Path):
+        # given
+        store = ProfileStore(tmp_path, capacity=2)
+        store.save(make_stats(), make_profile_info("1000-00000000"))
+        # e.g. left by interrupted write of older version
+        tmp_path.joinpath("1001-00000001.json").write_text('{"id": "1001-')
+
+        # when
+        infos = store.list()
+
+        # then
+        assert [info.id for info in infos] == ["1000-00000000"]
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "1000-00000000.json",
+            "1000-00000000.prof",
+            "1001-00000001.json",
+        ], "temporary files shouldn't be left"
+
+    def test_profile_store_get_path_rejects_invalid_ids(self, tmp_path: Path):
+        store = ProfileStore(tmp_path, capacity=2)
+        assert store.get_path("../secret") is None
+
+
+class TestProfilingMiddleware:
+    def make_client(self, tmp_path: Path, **environment_values) -> TestClient:
+        app = FastAPI()
+        store = ProfileStore(tmp_path, capacity=5)
+        environment = Environment(**environment_values)
+        app.add_middleware(ProfilingMiddleware, store=store, environment=environment)
+
+        @app.get("/endpoint")
+        async def endpoint():
+            # simulate query execution tracked by engine events
+            if (timing := sql_timing.get()) is not None:
+                timing.duration += 0.5
+                timing.queries += 1
+            return {}
+
+        @app.get("/rates")
+        async def rates(
+            request: RatesRequest = Depends(make_dependable(RatesRequest)),
+        ):
+            return {}
+
+        @app.get("/stream")
+        async def stream():
+            async def events():
+                yield "first"
+                # stream body is sent after profile is stored
+                yield str(len(ProfileStore(tmp_path, capacity=5).list()))
+
+            return StreamingResponse(events())
+
+        return TestClient(app)
+
+    def test_request_with_admin_token_is_profiled(self, tmp_path: Path):
+        # given
+        client = self.make_client(tmp_path, profiling_admin_token="token")
+
+        # when
+        response = client.get("/endpoint?a=1", headers={PROFILE_TOKEN_HEADER: "token"})
+
+        # then
+        assert response.status_code == status.HTTP_200_OK
+        [info] = ProfileStore(tmp_path, capacity=5).list()
+        assert info.path == "/endpoint"
+        assert info.query == "a=1"
+        assert info.sql_duration == 0.5
+        assert info.sql_queries == 1
+        assert tmp_path.joinpath(f"{info.id}.prof").exists()
+
+    def test_request_without_admin_token_is_not_profiled(self, tmp_path: Path):
+        # given
+        client = self.make_client(tmp_path, profiling_admin_token="token")
+
+        # when
+        client.get("/endpoint", headers={PROFILE_TOKEN_HEADER: "wrong"})
+        client.get("/endpoint")
+
+        # then
+        assert ProfileStore(tmp_path, capacity=5).list() == []
+
+    def test_sampled_request_is_profiled(self, tmp_path: Path):
+        # given
+        client = self.make_client(tmp_path, profiling_sample_rate=1.0)
+
+        # when
+        client.get("/endpoint")
+
+        # then
+        assert len(ProfileStore(tmp_path, capacity=5).list()) == 1
+
+    def test_profile_includes_query_params_validation(self, tmp_path: Path):
+        # given
+        client = self.make_client(tmp_path, profiling_sample_rate=1.0)
+
+        # when
+        client.get(
+            "/rates",
+            params={
+                "date_from": "2022-07-01",
+                "date_to": "2022-07-02",
+                "origin": "some_origin",
+                "destination": "some_destination",
+            },
+        )
+
+        # then
+        [info] = ProfileStore(tmp_path, capacity=5).list()
+        profiled_functions = get_profiled_functions(
+            tmp_path.joinpath(f"{info.id}.prof")
+        )
+        assert "init_cls_and_handle_errors" in profiled_functions
+        assert "check_dates_order" in profiled_functions
+
+    def test_profile_is_stored_when_response_starts(self, tmp_path: Path):
+        # given
+        client = self.make_client(tmp_path, profiling_sample_rate=1.0)
+
+        # when
+        response = client.get("/stream")
+
+        # then
+        assert response.text == "first1"
+
+
+class TestSqlTiming:
+    def test_sql_timing_is_not_tracked_by_default(self):
+        assert sql_timing.get() is None
+        assert SqlTiming().queries == 0
+
+    @pytest.mark.asyncio
+    async def test_sql_timing_tracks_queries_of_engine(self):
+        # given
+        engine = create_async_engine("sqlite+aiosqlite://")
+        track_sql_timing(engine)
+        timing = SqlTiming()
+        token = sql_timing.set(timing)
+
+        # when
+        try:
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+                await connection.execute(text("SELECT 2"))
+        finally:
+            sql_timing.reset(token)
+            await engine.dispose()
+
+        # then
+        # listeners run in greenlet of sqlalchemy, that should see request context
+        assert timing.queries == 2
+        assert timing.duration > 0
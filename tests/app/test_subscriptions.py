@@ -0,0 +1,245 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from rates.app.coverage import CoverageIndex
+from rates.app.models import AveragePrice
+from rates.app.subscriptions import (
+    Subscription,
+    SubscriptionHub,
+    format_event,
+    stream_events,
+)
+from rates.database.backends.base import PricesBackend
+
+
+def make_prices(*average_prices):
+    return [
+        AveragePrice(day=f"2022-07-0{index + 1}", average_price=average_price)
+        for index, average_price in enumerate(average_prices)
+    ]
+
+
+class TestSubscription:
+    @pytest.mark.asyncio
+    async def test_subscription_collects_changed_days_of_its_range(self, make_request):
+        # given
+        subscription = Subscription(make_request("2022-07-01", "2022-07-02"))
+        subscription.update(make_prices(None, 100.0, 300.0), version=0)
+
+        # when
+        subscription.update(make_prices(None, 200.0, 300.0), version=1)
+        subscription.update(make_prices(50.0, 200.0, 300.0), version=2)
+
+        # then
+        assert subscription.prices == {
+            price.day: price for price in make_prices(50.0, 200.0)
+        }
+        assert await subscription.get_changes(timeout=1) == make_prices(
+            50.0, 200.0
+        ), "changes should be merged and limited to subscription days"
+        assert (
+            await subscription.get_changes(timeout=0.01) == []
+        ), "changes shouldn't be returned twice"
+
+    @pytest.mark.asyncio
+    async def test_subscription_ignores_prices_of_older_versions(self, make_request):
+        # given
+        subscription = Subscription(make_request("2022-07-01", "2022-07-01"))
+        subscription.update(make_prices(100.0), version=2)
+
+        # when
+        subscription.update(make_prices(50.0), version=1)
+
+        # then
+        assert subscription.prices == {"2022-07-01": make_prices(100.0)[0]}
+        assert await subscription.get_changes(timeout=0.01) == []
+
+
+class TestSubscriptionHub:
+    @pytest.mark.asyncio
+    async def test_publish_changes_computes_prices_once_per_route(self, make_request):
+        # given
+        hub = SubscriptionHub(MagicMock(PricesBackend), CoverageIndex())
+        with patch(
+            "rates.app.subscriptions.get_average_prices",
+            side_effect=[
+                make_prices(None),
+                make_prices(None, 100.0),
+                make_prices(10.0, 200.0, 300.0),
+            ],
+        ) as get_average_prices:
+            first_subscription = await hub.subscribe(
+                make_request("2022-07-01", "2022-07-01")
+            )
+            second_subscription = await hub.subscribe(
+                make_request("2022-07-01", "2022-07-02")
+            )
+
+            # when
+            await hub.publish_changes()
+
+        # then
+        assert get_average_prices.await_count == 3
+        # prices for route should be computed for union of subscriptions date ranges
+        assert get_average_prices.await_args.args[1] == make_request(
+            "2022-07-01", "2022-07-02"
+        )
+        assert await first_subscription.get_changes(timeout=1) == make_prices(10.0)
+        assert await second_subscription.get_changes(timeout=1) == make_prices(
+            10.0, 200.0
+        )
+
+    @pytest.mark.asyncio
+    async def test_publish_changes_continues_after_route_failure(self, make_request):
+        # given
+        hub = SubscriptionHub(MagicMock(PricesBackend), CoverageIndex())
+        published = False
+
+        async def get_average_prices(backend, request, *args):
+            if published and request.origin == "some_port_3":
+                raise ConnectionError("database is unavailable")
+            return make_prices(100.0 if published else None)
+
+        with patch(
+            "rates.app.subscriptions.get_average_prices",
+            side_effect=get_average_prices,
+        ):
+            failing_subscription = await hub.subscribe(
+                make_request("2022-07-01", "2022-07-01", origin="some_port_3")
+            )
+            subscription = await hub.subscribe(make_request("2022-07-01", "2022-07-01"))
+
+            # when
+            published = True
+            await hub.publish_changes()
+
+        # then
+        assert await subscription.get_changes(timeout=1) == make_prices(
+            100.0
+        ), "other routes should get changes"
+        assert await failing_subscription.get_changes(timeout=0.01) == []
+
+    @pytest.mark.asyncio
+    async def test_unsubscribed_subscription_doesnt_get_changes(self, make_request):
+        # given
+        hub = SubscriptionHub(MagicMock(PricesBackend), CoverageIndex())
+        with patch(
+            "rates.app.subscriptions.get_average_prices",
+            return_value=make_prices(None),
+        ) as get_average_prices:
+            subscription = await hub.subscribe(make_request("2022-07-01", "2022-07-01"))
+
+            # when
+            hub.unsubscribe(subscription)
+            await hub.publish_changes()
+
+        # then
+        get_average_prices.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_subscribe_doesnt_wait_for_publish(self, make_request):
+        # given
+        hub = SubscriptionHub(MagicMock(PricesBackend), CoverageIndex())
+        publish_released = asyncio.Event()
+
+        async def get_average_prices(backend, request, coverage_index, cache):
+            if request.origin == "slow_port":
+                await publish_released.wait()
+            return make_prices(None)
+
+        with patch(
+            "rates.app.subscriptions.get_average_prices",
+            side_effect=get_average_prices,
+        ):
+            slow_subscription = Subscription(
+                make_request("2022-07-01", "2022-07-01").copy(
+                    update={"origin": "slow_port"}
+                )
+            )
+            hub._routes[("slow_port", "some_port_2")].add(slow_subscription)
+            publish = asyncio.create_task(hub.publish_changes())
+            await asyncio.sleep(0)
+
+            # when
+            subscription = await asyncio.wait_for(
+                hub.subscribe(make_request("2022-07-01", "2022-07-01")), timeout=1
+            )
+
+            # then
+            assert subscription.prices == {"2022-07-01": make_prices(None)[0]}
+            publish_released.set()
+            await publish
+
+    @pytest.mark.asyncio
+    async def test_subscription_keeps_changes_published_while_subscribing(
+        self, make_request
+    ):
+        # given
+        hub = SubscriptionHub(MagicMock(PricesBackend), CoverageIndex())
+        initial_prices_released = asyncio.Event()
+        calls = 0
+
+        async def get_average_prices(backend, request, coverage_index, cache):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                # initial prices are computed from data before the change
+                await initial_prices_released.wait()
+                return make_prices(None)
+            return make_prices(100.0)
+
+        with patch(
+            "rates.app.subscriptions.get_average_prices",
+            side_effect=get_average_prices,
+        ):
+            subscribe = asyncio.create_task(
+                hub.subscribe(make_request("2022-07-01", "2022-07-01"))
+            )
+            await asyncio.sleep(0)
+
+            # when
+            await hub.publish_changes()
+            initial_prices_released.set()
+            subscription = await subscribe
+
+        # then
+        assert subscription.prices == {
+            "2022-07-01": make_prices(100.0)[0]
+        }, "initial prices of older data version shouldn't replace published ones"
+
+
+class TestStreamEvents:
+    @pytest.mark.asyncio
+    async def test_stream_events(self, make_request):
+        # given
+        hub = MagicMock(SubscriptionHub)
+        subscription = Subscription(make_request("2022-07-01", "2022-07-02"))
+        subscription.update(make_prices(None, 100.0), version=0)
+        subscription.update(make_prices(None, 200.0), version=1)
+        is_disconnected = AsyncMock(side_effect=[False, False, True])
+
+        # when
+        events = [
+            event
+            async for event in stream_events(
+                hub, subscription, is_disconnected, heartbeat_interval=0.01
+            )
+        ]
+
+        # then
+        assert events == [
+            format_event(make_prices(None, 200.0)),
+            format_event([AveragePrice(day="2022-07-02", average_price=200.0)]),
+            ": heartbeat\n\n",
+        ]
+        hub.unsubscribe.assert_called_once_with(subscription)
+
+
+class TestFormatEvent:
+    def test_format_event(self):
+        assert format_event(make_prices(None, 1.5)) == (
+            "event: prices\n"
+            'data: [{"day": "2022-07-01", "average_price": null}, '
+            '{"day": "2022-07-02", "average_price": 1.5}]\n\n'
+        )
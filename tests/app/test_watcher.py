@@ -0,0 +1,28 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from rates.app.watcher import PricesWatcher
+from rates.database.backends.base import PricesBackend
+
+
+class TestPricesWatcher:
+    @pytest.mark.asyncio
+    async def test_check_calls_callbacks_on_version_change(self):
+        # given
+        backend_mock = MagicMock(PricesBackend)
+        backend_mock.get_version = AsyncMock(
+            side_effect=[((1, 10),), ((1, 10),), ((2, 10),)]
+        )
+        watcher = PricesWatcher(backend_mock, interval=1)
+        callback = AsyncMock()
+        failing_callback = AsyncMock(side_effect=RuntimeError)
+        watcher.on_change(failing_callback)
+        watcher.on_change(callback)
+
+        # when & then
+        assert not await watcher.check(), "first check should only store version"
+        assert not await watcher.check()
+        callback.assert_not_awaited()
+        assert await watcher.check()
+        # failing callback shouldn't prevent other callbacks from being called
+        callback.assert_awaited_once()
@@ -0,0 +1,31 @@
+from typing import Any, Callable
+
+import pytest
+from rates.app.models import RatesRequest
+
+
+@pytest.fixture
+def make_request() -> Callable[..., RatesRequest]:
+    """
+    Returns factory of rates requests, fields that aren't given are filled with
+    the same default values in all tests
+    """
+
+    def make(
+        date_from: str = "2022-07-01",
+        date_to: str = "2022-07-02",
+        origin: str = "some_port_1",
+        destination: str = "some_port_2",
+        **values: Any,
+    ) -> RatesRequest:
+        return RatesRequest.parse_obj(
+            {
+                "date_from": date_from,
+                "date_to": date_to,
+                "origin": origin,
+                "destination": destination,
+                **values,
+            }
+        )
+
+    return make
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from rates.database.backends import get_backend
+from rates.database.backends.chunked import ChunkedBackend
+from rates.database.backends.columnar import DuckDBBackend
+from rates.database.backends.postgres import PostgresBackend
+from rates.utils.environment import Environment
+from tests.database.backends.test_columnar import write_parquet
+
+
+class TestGetBackend:
+    def test_get_backend_creates_postgres_backend_by_default(self):
+        assert isinstance(get_backend(Environment()), PostgresBackend)
+
+    def test_get_backend_creates_duckdb_backend(self, tmp_path: Path):
+        # given
+        write_parquet(tmp_path)
+        environment = Environment(storage_backend="duckdb", duckdb_directory=tmp_path)
+
+        # when
+        backend = get_backend(environment)
+
+        # then
+        assert isinstance(backend, DuckDBBackend)
+        assert backend.directory == tmp_path
+
+    def test_get_backend_wraps_backend_to_split_long_date_ranges(self):
+        # given
+        environment = Environment(
+            chunk_days=90, chunk_parallelism=2, chunk_concurrency=6
+        )
+
+        # when
+        backend = get_backend(environment)
+
+        # then
+        assert isinstance(backend, ChunkedBackend)
+        assert isinstance(backend.backend, PostgresBackend)
+        assert (backend.chunk_days, backend.parallelism, backend.concurrency) == (
+            90,
+            2,
+            6,
+        )
+
+    def test_get_backend_module_does_not_require_duckdb(self):
+        # given
+        code = (
+            "import sys; import rates.database.backends; "
+            "assert 'duckdb' not in sys.modules"
+        )
+
+        # when
+        result = subprocess.run([sys.executable, "-c", code])
+
+        # then
+        assert result.returncode == 0, "duckdb should be imported only when used"
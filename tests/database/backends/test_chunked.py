@@ -0,0 +1,162 @@
+import asyncio
+import datetime
+from typing import List
+
+import pytest
+from rates.app.models import RatesRequest
+from rates.database.backends.base import DayTotal, PricesBackend
+from rates.database.backends.chunked import ChunkedBackend, split_request
+
+
+class SlowBackend(PricesBackend):
+    """
+    Backend that returns one price for every day and tracks concurrent queries
+    """
+
+    def __init__(self) -> None:
+        self.requests: List[RatesRequest] = []
+        self.running = 0
+        self.max_running = 0
+
+    async def get_day_totals(self, request: RatesRequest) -> List[DayTotal]:
+        self.requests.append(request)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        days = (request.date_to - request.date_from).days + 1
+        return [
+            (request.date_from + datetime.timedelta(days=offset), 100, 1)
+            for offset in range(days)
+        ]
+
+    async def get_day_estimates(self, request: RatesRequest):
+        return []
+
+    async def refresh_prices_sample(self, sample_size: int):
+        pass
+
+    async def get_routes_coverage(self):
+        return []
+
+    async def get_version(self):
+        return 1
+
+
+class TestChunkedBackend:
+    @pytest.mark.asyncio
+    async def test_get_day_totals_queries_chunks_concurrently(self, make_request):
+        # given
+        slow_backend = SlowBackend()
+        backend = ChunkedBackend(
+            slow_backend, chunk_days=10, parallelism=2, concurrency=4
+        )
+
+        # when
+        day_totals = await backend.get_day_totals(
+            make_request(
+                "2022-07-01",
+                "2022-08-09",
+                origin="some_region_1",
+                destination="some_region_2",
+            )
+        )
+
+        # then
+        assert len(slow_backend.requests) == 4
+        assert slow_backend.max_running == 2, "parallelism should be limited"
+        assert [day for day, _, _ in day_totals] == [
+            datetime.date(2022, 7, 1) + datetime.timedelta(days=offset)
+            for offset in range(40)
+        ], "chunks should be stitched in order"
+
+    @pytest.mark.asyncio
+    async def test_get_day_totals_limits_chunks_of_all_requests(self, make_request):
+        # given
+        slow_backend = SlowBackend()
+        backend = ChunkedBackend(
+            slow_backend, chunk_days=10, parallelism=2, concurrency=3
+        )
+        request = make_request(
+            "2022-07-01",
+            "2022-08-09",
+            origin="some_region_1",
+            destination="some_region_2",
+        )
+
+        # when
+        await asyncio.gather(*(backend.get_day_totals(request) for _ in range(3)))
+
+        # then
+        assert len(slow_backend.requests) == 12
+        assert (
+            slow_backend.max_running == 3
+        ), "chunks of all requests should be limited together"
+
+    @pytest.mark.asyncio
+    async def test_get_day_totals_doesnt_split_short_requests(self, make_request):
+        # given
+        slow_backend = SlowBackend()
+        backend = ChunkedBackend(
+            slow_backend, chunk_days=10, parallelism=2, concurrency=4
+        )
+        request = make_request(
+            "2022-07-01",
+            "2022-07-10",
+            origin="some_region_1",
+            destination="some_region_2",
+        )
+
+        # when
+        await backend.get_day_totals(request)
+
+        # then
+        assert slow_backend.requests == [request]
+
+
+class TestSplitRequest:
+    def test_split_request(self, make_request):
+        assert split_request(
+            make_request(
+                "2022-07-01",
+                "2022-07-25",
+                origin="some_region_1",
+                destination="some_region_2",
+            ),
+            10,
+        ) == [
+            make_request(
+                "2022-07-01",
+                "2022-07-10",
+                origin="some_region_1",
+                destination="some_region_2",
+            ),
+            make_request(
+                "2022-07-11",
+                "2022-07-20",
+                origin="some_region_1",
+                destination="some_region_2",
+            ),
+            make_request(
+                "2022-07-21",
+                "2022-07-25",
+                origin="some_region_1",
+                destination="some_region_2",
+            ),
+        ]
+        assert split_request(
+            make_request(
+                "2022-07-01",
+                "2022-07-10",
+                origin="some_region_1",
+                destination="some_region_2",
+            ),
+            10,
+        ) == [
+            make_request(
+                "2022-07-01",
+                "2022-07-10",
+                origin="some_region_1",
+                destination="some_region_2",
+            )
+        ]
@@ -0,0 +1,244 @@
+import datetime
+import os
+from pathlib import Path
+from typing import List, Tuple
+from unittest.mock import AsyncMock, MagicMock
+
+import duckdb
+import pytest
+from rates.database.backends.columnar import (
+    DuckDBBackend,
+    export_to_parquet,
+    write_sample_parquet,
+)
+from rates.database.shards import DEFAULT_SHARD, Shards
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+PRICES = [
+    ("CNSGH", "NLRTM", "2022-07-01", 100),
+    ("CNSGH", "NLRTM", "2022-07-01", 200),
+    ("CNGGZ", "NLRTM", "2022-07-02", 300),
+    ("CNGGZ", "GBFXT", "2022-07-02", 400),
+]
+CODES = [
+    ("CNSGH", "CNSGH"),
+    ("CNGGZ", "CNGGZ"),
+    ("NLRTM", "NLRTM"),
+    ("GBFXT", "GBFXT"),
+    ("china_main", "CNSGH"),
+    ("china_main", "CNGGZ"),
+]
+# prices of one stratum of `china_main` and `europe` port regions
+REGIONAL_PRICES = [
+    ("CNSGH", "NLRTM", "2022-07-01", 100),
+    ("CNSGH", "NLRTM", "2022-07-01", 200),
+    ("CNSGH", "NLRTM", "2022-07-01", 300),
+    ("CNGGZ", "GBFXT", "2022-07-01", 600),
+]
+REGIONAL_CODES = CODES + [("europe", "NLRTM"), ("europe", "GBFXT")]
+
+
+def write_parquet(
+    directory: Path,
+    prices: List[Tuple[str, str, str, int]] = PRICES,
+    codes: List[Tuple[str, str]] = CODES,
+    sample_size: int = 1,
+) -> None:
+    connection = duckdb.connect()
+    connection.execute(
+        "CREATE TABLE prices (orig_code text, dest_code text, day date, price integer)"
+    )
+    connection.executemany("INSERT INTO prices VALUES (?, ?, ?, ?)", prices)
+    connection.execute("CREATE TABLE codes (key text, code text)")
+    connection.executemany("INSERT INTO codes VALUES (?, ?)", codes)
+    for table in ("prices", "codes"):
+        path = directory.joinpath(f"{table}.parquet")
+        connection.execute(f"COPY {table} TO '{path}' (FORMAT PARQUET)")
+    write_sample_parquet(directory, sample_size)
+
+
+class TestDuckDBBackend:
+    @pytest.mark.asyncio
+    async def test_get_day_totals(self, tmp_path: Path, make_request):
+        # given
+        write_parquet(tmp_path)
+        backend = DuckDBBackend(tmp_path)
+        request = make_request(
+            "2022-07-01", "2022-07-10", origin="china_main", destination="NLRTM"
+        )
+
+        # when
+        day_totals = await backend.get_day_totals(request)
+
+        # then
+        assert sorted(day_totals) == [
+            (datetime.date(2022, 7, 1), 300, 2),
+            (datetime.date(2022, 7, 2), 300, 1),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_day_estimates_of_regions_from_sample(
+        self, tmp_path: Path, make_request
+    ):
+        # given
+        write_parquet(tmp_path, REGIONAL_PRICES, REGIONAL_CODES, sample_size=2)
+        backend = DuckDBBackend(tmp_path)
+        request = make_request(
+            origin="china_main", destination="europe", approximate=True
+        )
+
+        # when
+        day_estimates = await backend.get_day_estimates(request)
+
+        # then
+        # two of four prices of the stratum are sampled, the sum is estimated
+        # as 4 * (a + b) / 2 with variance 4 * (4 - 2) * (a - b)^2 / 2 / 2
+        assert len(day_estimates) == 1
+        day, prices_count, sample_size, prices_sum, variance = day_estimates[0]
+        assert (day, prices_count, sample_size) == (datetime.date(2022, 7, 1), 4, 2)
+        prices = [price for *_, price in REGIONAL_PRICES]
+        assert (prices_sum, variance) in [
+            (2 * (a + b), 2 * (a - b) ** 2)
+            for i, a in enumerate(prices)
+            for b in prices[i + 1 :]
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_day_estimates_of_port_are_exact(
+        self, tmp_path: Path, make_request
+    ):
+        # given
+        write_parquet(tmp_path, REGIONAL_PRICES, REGIONAL_CODES, sample_size=2)
+        backend = DuckDBBackend(tmp_path)
+        request = make_request(
+            origin="china_main", destination="NLRTM", approximate=True
+        )
+
+        # when
+        day_estimates = await backend.get_day_estimates(request)
+
+        # then
+        # port region strata mix routes, so ports are answered from prices
+        assert day_estimates == [(datetime.date(2022, 7, 1), 3, 3, 600, 0)]
+
+    @pytest.mark.asyncio
+    async def test_refresh_prices_sample_rebuilds_outdated_sample(
+        self, tmp_path: Path, make_request
+    ):
+        # given
+        write_parquet(tmp_path, REGIONAL_PRICES, REGIONAL_CODES, sample_size=2)
+        backend = DuckDBBackend(tmp_path)
+        request = make_request(
+            origin="china_main", destination="europe", approximate=True
+        )
+        sample_path = tmp_path.joinpath("prices_sample.parquet")
+        os.utime(sample_path, ns=(1, 1))
+
+        # when
+        await backend.refresh_prices_sample(sample_size=4)
+
+        # then
+        assert sample_path.stat().st_mtime_ns > 1
+        assert await backend.get_day_estimates(request) == [
+            (datetime.date(2022, 7, 1), 4, 4, 1200, 0)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_refresh_prices_sample_keeps_fresh_sample(self, tmp_path: Path):
+        # given
+        write_parquet(tmp_path)
+        backend = DuckDBBackend(tmp_path)
+        sample_path = tmp_path.joinpath("prices_sample.parquet")
+        modified_at = sample_path.stat().st_mtime_ns
+
+        # when
+        await backend.refresh_prices_sample(sample_size=4)
+
+        # then
+        assert sample_path.stat().st_mtime_ns == modified_at
+
+    @pytest.mark.asyncio
+    async def test_get_routes_coverage(self, tmp_path: Path):
+        # given
+        write_parquet(tmp_path)
+        backend = DuckDBBackend(tmp_path)
+
+        # when
+        routes_coverage = await backend.get_routes_coverage()
+
+        # then
+        assert (
+            "china_main",
+            "NLRTM",
+            datetime.date(2022, 7, 1),
+            datetime.date(2022, 7, 2),
+            3,
+        ) in routes_coverage
+        assert len(routes_coverage) == 5
+
+    @pytest.mark.asyncio
+    async def test_get_version_changes_with_files(self, tmp_path: Path):
+        # given
+        write_parquet(tmp_path)
+        backend = DuckDBBackend(tmp_path)
+        version = await backend.get_version()
+
+        # when
+        os.utime(tmp_path.joinpath("prices.parquet"), ns=(1, 1))
+
+        # then
+        assert await backend.get_version() != version
+
+
+class TestExportToParquet:
+    @pytest.mark.asyncio
+    async def test_export_to_parquet(self, tmp_path: Path):
+        # given
+        def make_engine_mock(queries_rows):
+            engine_mock = MagicMock(AsyncEngine)
+            connection_mock = engine_mock.connect.return_value.__aenter__.return_value
+
+            async def stream(query):
+                rows = queries_rows[str(query).split(" FROM ")[1]]
+                result = MagicMock()
+
+                async def partitions(batch_size):
+                    yield rows
+
+                result.partitions = partitions
+                return result
+
+            connection_mock.stream = AsyncMock(side_effect=stream)
+            return engine_mock
+
+        def to_rows(prices):
+            return [
+                (orig, dest, datetime.date.fromisoformat(day), price)
+                for orig, dest, day, price in prices
+            ]
+
+        shards = Shards(
+            {
+                DEFAULT_SHARD: make_engine_mock(
+                    {"prices": to_rows(PRICES[2:]), "codes": CODES}
+                ),
+                "asia": make_engine_mock({"prices": to_rows(PRICES[:2])}),
+            },
+            {"CNSGH": "asia"},
+        )
+
+        # when
+        await export_to_parquet(shards, tmp_path, sample_size=10)
+
+        # then
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "codes.parquet",
+            "prices.parquet",
+            "prices_sample.parquet",
+        ], "only Parquet files should be left"
+        backend = DuckDBBackend(tmp_path)
+        assert len(await backend.get_routes_coverage()) == 5
+        sample_path = tmp_path.joinpath("prices_sample.parquet")
+        assert duckdb.connect().execute(
+            f"SELECT count(*) FROM read_parquet('{sample_path}')"
+        ).fetchall() == [(len(PRICES),)], "all prices fit into sample of size 10"
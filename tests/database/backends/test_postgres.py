@@ -0,0 +1,113 @@
+import datetime
+from unittest.mock import MagicMock, call, patch
+
+import pytest
+from rates.app.models import RatesRequest
+from rates.database.backends.postgres import PostgresBackend
+from rates.database.shards import DEFAULT_SHARD, Shards
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class TestPostgresBackend:
+    shards: Shards
+
+    def setup_method(self):
+        self.default_engine = MagicMock(AsyncEngine)
+        self.asia_engine = MagicMock(AsyncEngine)
+        self.shards = Shards(
+            {DEFAULT_SHARD: self.default_engine, "asia": self.asia_engine},
+            {"CNSGH": "asia"},
+        )
+
+    @pytest.mark.asyncio
+    async def test_get_day_totals_gathers_shards_day_totals(self):
+        # given
+        backend = PostgresBackend(self.shards)
+        request = RatesRequest(
+            date_from="2022-07-01",
+            date_to="2022-07-02",
+            origin="china_main",
+            destination="NLRTM",
+        )
+        with patch(
+            "rates.database.backends.postgres.get_shard_day_totals",
+            side_effect=[
+                [(datetime.date(2022, 7, 1), 300, 2)],
+                [(datetime.date(2022, 7, 1), 100, 1)],
+            ],
+        ) as get_shard_day_totals_patch:
+            # when
+            day_totals = await backend.get_day_totals(request)
+
+        # then
+        # region origin should be queried on every shard
+        get_shard_day_totals_patch.assert_has_calls(
+            [call(self.default_engine, request), call(self.asia_engine, request)]
+        )
+        assert day_totals == [
+            (datetime.date(2022, 7, 1), 300, 2),
+            (datetime.date(2022, 7, 1), 100, 1),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_day_totals_queries_origin_port_shard_only(self):
+        # given
+        backend = PostgresBackend(self.shards)
+        request = RatesRequest(
+            date_from="2022-07-01",
+            date_to="2022-07-02",
+            origin="CNSGH",
+            destination="NLRTM",
+        )
+        with patch(
+            "rates.database.backends.postgres.get_shard_day_totals", return_value=[]
+        ) as get_shard_day_totals_patch:
+            # when
+            await backend.get_day_totals(request)
+
+        # then
+        get_shard_day_totals_patch.assert_awaited_once_with(self.asia_engine, request)
+
+    @pytest.mark.asyncio
+    async def test_get_day_estimates_gathers_shards_day_estimates(self):
+        # given
+        backend = PostgresBackend(self.shards)
+        request = RatesRequest(
+            date_from="2022-07-01",
+            date_to="2022-07-02",
+            origin="china_main",
+            destination="NLRTM",
+            approximate=True,
+        )
+        with patch(
+            "rates.database.backends.postgres.get_shard_day_estimates",
+            side_effect=[
+                [(datetime.date(2022, 7, 1), 10, 2, 1500, 50000)],
+                [(datetime.date(2022, 7, 1), 1, 1, 100, 0)],
+            ],
+        ) as get_shard_day_estimates_patch:
+            # when
+            day_estimates = await backend.get_day_estimates(request)
+
+        # then
+        get_shard_day_estimates_patch.assert_has_calls(
+            [call(self.default_engine, request), call(self.asia_engine, request)]
+        )
+        assert day_estimates == [
+            (datetime.date(2022, 7, 1), 10, 2, 1500, 50000),
+            (datetime.date(2022, 7, 1), 1, 1, 100, 0),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_version_combines_shards_versions(self):
+        # given
+        backend = PostgresBackend(self.shards)
+        with patch(
+            "rates.database.backends.postgres.get_shard_prices_version",
+            side_effect=[(10, 1), (20, 2)],
+        ):
+            # when
+            version = await backend.get_version()
+
+        # then
+        assert version == ((10, 1), (20, 2))
@@ -0,0 +1,129 @@
+from unittest.mock import MagicMock
+
+import duckdb
+import pytest
+from rates.database.sample import (
+    CREATE_PRICES_SAMPLE_QUERIES,
+    get_prices_sample_query,
+    refresh_prices_sample,
+)
+from rates.database.shards import DEFAULT_SHARD, Shards
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+def create_tables() -> duckdb.DuckDBPyConnection:
+    connection = duckdb.connect()
+    connection.execute(
+        "CREATE TABLE prices (orig_code text, dest_code text, day date, price int)"
+    )
+    connection.execute("CREATE TABLE codes (key text, code text)")
+    connection.executemany(
+        "INSERT INTO codes VALUES (?, ?)",
+        [
+            ("CNSGH", "CNSGH"),
+            ("CNGGZ", "CNGGZ"),
+            ("CNTXG", "CNTXG"),
+            ("NLRTM", "NLRTM"),
+            ("china_main", "CNSGH"),
+            ("china_main", "CNGGZ"),
+        ],
+    )
+    return connection
+
+
+class TestGetPricesSampleQuery:
+    def test_prices_sample_query_limits_prices_per_regions_and_day(self):
+        # given
+        connection = create_tables()
+        prices = [("CNSGH", "NLRTM", "2022-07-01", price) for price in range(5)]
+        prices += [("CNGGZ", "NLRTM", "2022-07-01", price) for price in range(5)]
+        prices.append(("CNSGH", "NLRTM", "2022-07-02", 100))
+        connection.executemany("INSERT INTO prices VALUES (?, ?, ?, ?)", prices)
+
+        # when
+        sample = connection.execute(
+            f"SELECT orig_region, dest_region, day, count(*), min(prices_count), "
+            f"max(prices_count) FROM ({get_prices_sample_query(3)}) "
+            f"GROUP BY orig_region, dest_region, day ORDER BY day"
+        ).fetchall()
+
+        # then
+        assert [row[:2] + row[3:] for row in sample] == [
+            ("china_main", "NLRTM", 3, 10, 10),
+            ("china_main", "NLRTM", 1, 1, 1),
+        ], "at most 3 prices should be sampled with the amount of stratum prices"
+
+    def test_port_region_is_the_smallest_region_of_port(self):
+        # given
+        connection = create_tables()
+        connection.executemany(
+            "INSERT INTO codes VALUES (?, ?)",
+            [("china", "CNSGH"), ("china", "CNGGZ"), ("china", "CNTXG")],
+        )
+        connection.execute(
+            "INSERT INTO prices VALUES ('CNTXG', 'NLRTM', '2022-07-01', 100)"
+        )
+
+        # when
+        sample = connection.execute(
+            f"SELECT orig_code, orig_region FROM ({get_prices_sample_query(3)})"
+        ).fetchall()
+
+        # then
+        assert sample == [("CNTXG", "china")], "port outside of `china_main`"
+
+
+class TestRefreshPricesSample:
+    @pytest.mark.asyncio
+    async def test_refresh_prices_sample_rebuilds_sample_on_every_shard(self):
+        # given
+        engines = {
+            DEFAULT_SHARD: MagicMock(AsyncEngine),
+            "asia": MagicMock(AsyncEngine),
+        }
+        for engine in engines.values():
+            connection = engine.connect.return_value.__aenter__.return_value
+            connection.execute.return_value = MagicMock()
+        shards = Shards(engines, {"CNSGH": "asia"})
+
+        # when
+        await refresh_prices_sample(shards, sample_size=5)
+
+        # then
+        for engine in engines.values():
+            connection = engine.connect.return_value.__aenter__.return_value
+            queries = [
+                str(execute_call.args[0])
+                for execute_call in connection.execute.call_args_list
+            ]
+            assert queries[: len(CREATE_PRICES_SAMPLE_QUERIES)] == list(
+                CREATE_PRICES_SAMPLE_QUERIES
+            )
+            assert "pg_try_advisory_xact_lock" in queries[-3]
+            assert queries[-2] == "DELETE FROM prices_sample"
+            assert queries[-1].startswith("INSERT INTO prices_sample")
+            assert "sample_number <= 5" in queries[-1]
+            assert connection.commit.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_refresh_prices_sample_skips_shard_refreshed_by_another_process(
+        self,
+    ):
+        # given
+        engine = MagicMock(AsyncEngine)
+        connection = engine.connect.return_value.__aenter__.return_value
+        lock_query = MagicMock()
+        lock_query.scalar.return_value = False
+        connection.execute.return_value = lock_query
+        shards = Shards({DEFAULT_SHARD: engine}, {})
+
+        # when
+        await refresh_prices_sample(shards, sample_size=5)
+
+        # then
+        queries = [
+            str(execute_call.args[0])
+            for execute_call in connection.execute.call_args_list
+        ]
+        assert "DELETE FROM prices_sample" not in queries
+        connection.rollback.assert_awaited_once()
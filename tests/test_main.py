@@ -1,9 +1,29 @@
-from unittest.mock import patch
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
-from rates.app.models import AveragePrice, RatesRequest
-from rates.main import app, engine
+from rates.app.cache import PricesCache
+from rates.app.coverage import CoverageIndex
+from rates.app.hot_routes import HotRoutes
+from rates.app.models import (
+    ApproximateAveragePrice,
+    AveragePrice,
+    RatesRequest,
+)
+from rates.app.prices import get_average_prices
+from rates.app.subscriptions import SubscriptionHub
+from rates.database.backends.base import PricesBackend
+from rates.main import (
+    app,
+    backend,
+    coverage_index,
+    environment,
+    prices_cache,
+    refresh_prices_data,
+)
 
 
 class TestRatesEndpoint:
@@ -162,16 +182,198 @@ class TestRatesEndpoint:
             )
 
             # then
-            # `get_average_prices` should be called with engine from `main.py` and
-            # provided request
+            # `get_average_prices` should be called with backend, coverage index and
+            # prices cache from `main.py` and provided request
             get_average_prices_patch.assert_called_once_with(
-                engine,
+                backend,
                 RatesRequest(
                     date_from="2022-07-01",
                     date_to="2022-07-02",
                     origin="some_origin",
                     destination="some_destination",
                 ),
+                coverage_index,
+                prices_cache,
             )
             assert response.status_code == status.HTTP_200_OK
             assert response.json() == [{"day": "2022-07-01", "average_price": 4.2}]
+
+    def test_rates_endpoint_calls_get_approximate_average_prices(self):
+        # given
+        approximate_average_price = ApproximateAveragePrice(
+            day="2022-07-01",
+            average_price=4.2,
+            confidence_low=4.0,
+            confidence_high=4.4,
+            sample_size=10,
+        )
+        with patch(
+            "rates.main.get_approximate_average_prices",
+            return_value=[approximate_average_price],
+        ) as get_approximate_average_prices_patch:
+            # when
+            response = self.client.get(
+                self.endpoint,
+                params={
+                    "date_from": "2022-07-01",
+                    "date_to": "2022-07-01",
+                    "origin": "some_origin",
+                    "destination": "some_destination",
+                    "approximate": "true",
+                },
+            )
+
+            # then
+            get_approximate_average_prices_patch.assert_called_once_with(
+                backend,
+                RatesRequest(
+                    date_from="2022-07-01",
+                    date_to="2022-07-01",
+                    origin="some_origin",
+                    destination="some_destination",
+                    approximate=True,
+                ),
+                coverage_index,
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == [approximate_average_price.dict()]
+
+    def test_rates_endpoint_response_schema_has_exact_and_approximate_prices(self):
+        # given & when
+        schema = self.client.get("/openapi.json").json()
+        # then
+        response = schema["paths"]["/rates"]["get"]["responses"]["200"]
+        assert [
+            response_schema["items"]
+            for response_schema in response["content"]["application/json"]["schema"][
+                "anyOf"
+            ]
+        ] == [
+            {"$ref": "#/components/schemas/ApproximateAveragePrice"},
+            {"$ref": "#/components/schemas/AveragePrice"},
+        ]
+        assert "confidence_low" in (
+            schema["components"]["schemas"]["ApproximateAveragePrice"]["properties"]
+        )
+
+
+class TestSubscribeEndpoint:
+    client: TestClient
+
+    @classmethod
+    def setup_class(cls):
+        cls.client = TestClient(app)
+
+    def test_subscribe_endpoint_fails_on_request_with_wrong_date_order(self):
+        # given & when
+        response = self.client.get(
+            "/rates/subscribe",
+            params={
+                "date_from": "2022-07-02",
+                "date_to": "2022-07-01",
+                "origin": "some_origin",
+                "destination": "some_destination",
+            },
+        )
+        # then
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_subscribe_endpoint_fails_on_approximate_request(self):
+        # given & when
+        response = self.client.get(
+            "/rates/subscribe",
+            params={
+                "date_from": "2022-07-01",
+                "date_to": "2022-07-02",
+                "origin": "some_origin",
+                "destination": "some_destination",
+                "approximate": "true",
+            },
+        )
+        # then
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TestProfilesEndpoint:
+    client: TestClient
+
+    @classmethod
+    def setup_class(cls):
+        cls.client = TestClient(app)
+
+    def test_profiles_endpoint_requires_admin_token(self):
+        # given & when
+        response = self.client.get("/profiles")
+        # then
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_profile_endpoint_requires_admin_token(self):
+        # given & when
+        response = self.client.get("/profiles/1000-00000000")
+        # then
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestRefreshPricesData:
+    @pytest.mark.asyncio
+    async def test_request_during_refresh_doesnt_cache_stale_prices(self):
+        # given
+        # route gets prices, coverage index is reloaded slowly
+        coverage_loading = asyncio.Event()
+        coverage_released = asyncio.Event()
+
+        async def get_routes_coverage():
+            coverage_loading.set()
+            await coverage_released.wait()
+            day = datetime.date(2022, 7, 1)
+            return [("some_origin", "some_destination", day, day, 3)]
+
+        backend_mock = MagicMock(PricesBackend)
+        backend_mock.get_routes_coverage = AsyncMock(side_effect=get_routes_coverage)
+        backend_mock.get_day_totals = AsyncMock(
+            return_value=[(datetime.date(2022, 7, 1), 300, 3)]
+        )
+        old_coverage_index = CoverageIndex()
+        old_coverage_index.loaded = True
+        cache = PricesCache(max_size=10)
+        hot_routes_mock = MagicMock(HotRoutes)
+        hot_routes_mock.get_top.return_value = []
+        hub_mock = MagicMock(SubscriptionHub)
+        hub_mock.publish_changes = AsyncMock()
+        request = RatesRequest(
+            date_from="2022-07-01",
+            date_to="2022-07-01",
+            origin="some_origin",
+            destination="some_destination",
+        )
+
+        with patch.multiple(
+            "rates.main",
+            backend=backend_mock,
+            coverage_index=old_coverage_index,
+            prices_cache=cache,
+            hot_routes=hot_routes_mock,
+            subscription_hub=hub_mock,
+        ):
+            # when
+            refresh = asyncio.create_task(refresh_prices_data())
+            await coverage_loading.wait()
+            prices_during_refresh = await get_average_prices(
+                backend_mock, request, old_coverage_index, cache
+            )
+            coverage_released.set()
+            await refresh
+            prices_after_refresh = await get_average_prices(
+                backend_mock, request, old_coverage_index, cache
+            )
+
+        # then
+        assert prices_during_refresh == [
+            AveragePrice(day="2022-07-01", average_price=None)
+        ], "request during refresh uses the old coverage index"
+        assert prices_after_refresh == [
+            AveragePrice(day="2022-07-01", average_price=100.0)
+        ], "prices computed with the old coverage index shouldn't stay cached"
+        backend_mock.refresh_prices_sample.assert_awaited_once_with(
+            environment.prices_sample_size
+        )
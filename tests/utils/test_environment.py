@@ -15,6 +15,8 @@ class TestEnvironment:
                 "DB_DATABASE": "database",
                 "DB_HOST": "host",
                 "DB_PORT": "1111",
+                "DB_SHARDS": '{"asia": "postgresql+asyncpg://asia/database"}',
+                "DB_SHARD_MAP": '{"CNSGH": "asia"}',
             },
         ):
             # when
@@ -27,6 +29,8 @@ class TestEnvironment:
             db_database="database",
             db_host="host",
             db_port=1111,
+            db_shards={"asia": "postgresql+asyncpg://asia/database"},
+            db_shard_map={"CNSGH": "asia"},
         )
 
         assert (
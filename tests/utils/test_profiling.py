@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+from rates.utils.profiling import RequestProfile, request_profile, run_profiled
+
+
+class TestRunProfiled:
+    @pytest.mark.asyncio
+    async def test_thread_work_of_profiled_request_is_profiled(self):
+        # given
+        def thread_work():
+            return sum(range(10))
+
+        profile = RequestProfile()
+        token = request_profile.set(profile)
+        profile.profile.enable()
+
+        # when
+        try:
+            result = await asyncio.to_thread(run_profiled, thread_work)
+        finally:
+            profile.profile.disable()
+            request_profile.reset(token)
+
+        # then
+        assert result == 45
+        profiled_functions = {function for _, _, function in profile.get_stats().stats}
+        assert "thread_work" in profiled_functions
+
+    def test_thread_work_is_not_profiled_by_default(self):
+        assert run_profiled(sum, [1, 2]) == 3